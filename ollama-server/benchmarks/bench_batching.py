@@ -0,0 +1,66 @@
+"""
+Cross-user prompt batching (PromptBatcher): throughput in generated
+tokens/s, time to the first token, wall time and decode steps for 1, 4
+and 16 users asking at once, with the
+batcher off (one streaming /api/chat request per user) and on (one
+/v1/completions request with the list of prompts per batch_window_ms).
+
+    python benchmarks/bench_batching.py
+"""
+import asyncio
+import time
+
+import common
+import fake_llm
+
+PORT = 11502
+
+USERS = [1, 4, 16]
+STEP_MS = 20.0
+TOKENS = 64
+SETTINGS = [("off", None), ("on (batch_window_ms=20)", 20), ("on (batch_window_ms=100)", 100)]
+
+
+async def answer(ai, user_id, start):
+    first = None
+    tokens = 0
+
+    async def emit(kind, text=""):
+        nonlocal first, tokens
+        if kind == "token":
+            tokens += 1
+            if first is None:
+                first = time.perf_counter() - start
+
+    await ai.answer_question(common.request("How fast?", user_id=user_id), emit)
+    return first, time.perf_counter() - start, tokens
+
+
+async def run(users, window_ms):
+    engine, stop = await fake_llm.start(PORT, step_ms=STEP_MS, slots=16, tokens=TOKENS)
+    ai = await common.setup_server(PORT, llm_slots=16)
+    if window_ms is not None:
+        ai.LLM_BATCHER = ai.PromptBatcher(window_ms / 1000.0, 16, f"http://127.0.0.1:{PORT}/v1/completions")
+    start = time.perf_counter()
+    results = await asyncio.gather(*(answer(ai, f"user{i}", start) for i in range(users)))
+    steps = engine.steps
+    await common.teardown_server()
+    await stop()
+    firsts = [first for first, _, _ in results]
+    total = max(last for _, last, _ in results)
+    tokens = sum(n for _, _, n in results)
+    return tokens / total, sum(firsts) / len(firsts), total, steps
+
+
+async def main():
+    print(f"Fake backend: {STEP_MS:.0f} ms per decode step, 16 slots, {TOKENS} tokens per answer; llm_slots = 16")
+    for users in USERS:
+        print(f"{users} user{'s' if users > 1 else ''}")
+        for label, window_ms in SETTINGS:
+            rate, first, total, steps = await run(users, window_ms)
+            print(f"  batching {label:26s} {rate:7.1f} tokens/s, first token after {first * 1000:6.1f} ms (mean), "
+                  f"all done after {total * 1000:7.1f} ms, {steps:4d} decode steps")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+Page text extraction: the old path (requests.get of the whole page, then
+BeautifulSoup's html.parser over all of it) against fetch_web_content
+(ParagraphExtractor fed while the body streams in, stopping once max_chars
+of text are collected). Pages come from a local server, optionally limited
+to a link speed, with the text spread over the page like on real sites.
+
+    python benchmarks/bench_extract.py [--mbit 20] [--max-chars 2000]
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from aiohttp import web
+
+import common
+
+PORT = 11502
+SIZES_KB = [100, 1000, 5000]
+
+
+def make_page(size_kb):
+    head = "<html><head><script>" + "var x = 1;" * 2000 + "</script></head><body><nav>menu</nav>"
+    para = "<div class='c'><p>" + "Some sentence about the topic at hand. " * 12 + "</p></div>\n"
+    body = para * (size_kb * 1024 // len(para) + 1)
+    return (head + body + "</body></html>").encode()
+
+
+def make_app(pages, bytes_per_sec, sent):
+    async def handler(request):
+        page = pages[int(request.match_info["kb"])]
+        response = web.StreamResponse(headers={"Content-Type": "text/html; charset=utf-8"})
+        response.content_length = len(page)
+        await response.prepare(request)
+        try:
+            for i in range(0, len(page), 16384):
+                await response.write(page[i:i + 16384])
+                sent[request.path] = sent.get(request.path, 0) + len(page[i:i + 16384])
+                if bytes_per_sec:
+                    await asyncio.sleep(16384 / bytes_per_sec)
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        return response
+
+    app = web.Application()
+    app.router.add_get("/{kb}", handler)
+    return app
+
+
+def old_extract(url, max_chars):
+    import requests
+    from bs4 import BeautifulSoup
+    response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=60)
+    soup = BeautifulSoup(response.text, 'html.parser')
+    text = " ".join(p.get_text() for p in soup.find_all('p'))
+    return text[:max_chars] + "..." if len(text) > max_chars else text
+
+
+async def measure(coro_func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    text = await coro_func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return text, elapsed, peak
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mbit", type=float, default=20.0, help="link speed, 0 = unlimited")
+    parser.add_argument("--max-chars", type=int, default=2000)
+    args = parser.parse_args()
+
+    pages = {kb: make_page(kb) for kb in SIZES_KB}
+    sent = {}
+    runner = web.AppRunner(make_app(pages, args.mbit * 125000, sent), handler_cancellation=True)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+    ai = await common.setup_server(PORT)
+    ai.CONFIG["FETCH_MAX_BYTES"] = 10 * 1024 * 1024
+    ai.CONFIG["FETCH_TIMEOUT"] = 120.0
+    print(f"link {args.mbit or 'unlimited'} Mbit/s, max_chars {args.max_chars}")
+    for kb in SIZES_KB:
+        url = f"http://127.0.0.1:{PORT}/{kb}"
+        for name, run in [
+            ("old requests + BeautifulSoup", lambda: asyncio.to_thread(old_extract, url, args.max_chars)),
+            ("ParagraphExtractor, streamed", lambda: ai.fetch_web_content(url, args.max_chars)),
+        ]:
+            sent.clear()
+            text, elapsed, peak = await measure(run)
+            await asyncio.sleep(0.1)
+            print(f"  {kb:5d} KB page  {name:30s} {elapsed * 1000:8.1f} ms  "
+                  f"{sum(sent.values()) // 1024:5d} KB read  {peak // 1024:6d} KB peak  {len(text)} chars")
+    await common.teardown_server()
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
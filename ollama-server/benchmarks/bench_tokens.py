@@ -0,0 +1,51 @@
+"""
+Token batching into websocket frames (TokenBatcher): frames sent, time to
+the first frame and total time for one answer, with batching off
+(batch_ms=0, one frame per token) and on, for a fast and a slow model and
+for a fast link and a 1200 baud terminal.
+
+    python benchmarks/bench_tokens.py
+"""
+import asyncio
+import time
+
+import common
+import fake_llm
+
+PORT = 11501
+
+MODELS = [("fast model (2 ms/token)", 2.0, 128), ("slow model (200 ms/token)", 200.0, 12)]
+SETTINGS = [("off (batch_ms=0)", 0, None), ("on (batch_ms=40)", 40, None),
+            ("on, 1200 baud link", 40, 120)]
+
+
+async def answer(ai, batch_ms, bytes_per_sec):
+    frames = []
+    start = time.perf_counter()
+
+    async def send(kind, text=""):
+        frames.append((time.perf_counter() - start, kind, text))
+
+    data = common.request("How fast?", batch_ms=batch_ms, bytes_per_sec=bytes_per_sec)
+    emit, batcher = ai.batched_emit(send, data)
+    await ai.answer_question(data, emit)
+    await batcher.flush()
+    tokens = [f for f in frames if f[1] == "token"]
+    return len(tokens), tokens[0][0], tokens[-1][0]
+
+
+async def main():
+    for name, step_ms, tokens in MODELS:
+        engine, stop = await fake_llm.start(PORT, step_ms=step_ms, slots=16, tokens=tokens)
+        ai = await common.setup_server(PORT)
+        print(f"{name}, {tokens} tokens")
+        for label, batch_ms, bytes_per_sec in SETTINGS:
+            frames, first, last = await answer(ai, batch_ms, bytes_per_sec)
+            print(f"  batching {label:20s} {frames:4d} frames, first after {first * 1000:6.1f} ms, "
+                  f"last after {last * 1000:7.1f} ms")
+        await common.teardown_server()
+        await stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,32 @@
+"""Setup shared by the benchmarks: the AI server module pointed at fake_llm."""
+import os
+import sys
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ollama_ai_server as ai  # noqa: E402
+
+
+async def setup_server(port, llm_slots=0, api="/api"):
+    ai.CONFIG = ai.load_config("/nonexistent")
+    ai.CONFIG.update({
+        "DEBUG": False,
+        "OLLAMA_URI": f"http://127.0.0.1:{port}{api}",
+        "EMBEDDING_MODEL": "",
+        "AUTH_TOKEN": "bench",
+    })
+    ai.HTTP_SESSION = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0))
+    ai.LLM_SCHEDULER = ai.LLMScheduler(llm_slots, 1000)
+    ai.LLM_BATCHER = None
+    return ai
+
+
+async def teardown_server():
+    await ai.HTTP_SESSION.close()
+
+
+def request(question, user_id="bench", **extra):
+    return dict({"auth_token": "bench", "user_id": user_id, "new_question": question,
+                 "conversation": [], "context": ""}, **extra)
@@ -0,0 +1,150 @@
+"""
+A fake LLM backend for the benchmarks. It speaks Ollama's /api/chat
+(NDJSON), OpenAI-style /v1/chat/completions (SSE) and /v1/completions
+(SSE, with a list of prompts), and runs every active sequence on one
+simulated accelerator: each decode step takes `step_ms` and produces one
+token for up to `slots` sequences at once (continuous batching, like
+Ollama with OLLAMA_NUM_PARALLEL, llama.cpp --parallel or vLLM).
+
+    python benchmarks/fake_llm.py --port 11500 --step-ms 20 --slots 16
+"""
+import argparse
+import asyncio
+import json
+
+from aiohttp import web
+
+
+class Engine:
+    def __init__(self, step_ms=20.0, slots=16, tokens=64):
+        self.step = step_ms / 1000.0
+        self.slots = slots
+        self.tokens = tokens
+        self.waiting = []  # queues of sequences not decoding yet
+        self.active = []
+        self.steps = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    def submit(self):
+        """Start a sequence; returns a queue that yields its tokens, then None."""
+        queue = asyncio.Queue()
+        self.waiting.append([queue, 0])
+        self._wakeup.set()
+        return queue
+
+    async def _run(self):
+        while True:
+            if not self.active and not self.waiting:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            while self.waiting and len(self.active) < self.slots:
+                self.active.append(self.waiting.pop(0))
+            await asyncio.sleep(self.step)
+            self.steps += 1
+            for seq in list(self.active):
+                queue, produced = seq
+                queue.put_nowait(f"tok{produced} ")
+                seq[1] = produced + 1
+                if seq[1] >= self.tokens:
+                    queue.put_nowait(None)
+                    self.active.remove(seq)
+
+
+async def _tokens(queue):
+    while True:
+        token = await queue.get()
+        if token is None:
+            return
+        yield token
+
+
+def make_app(engine):
+    async def ollama_chat(request):
+        await request.json()
+        response = web.StreamResponse()
+        await response.prepare(request)
+        async for token in _tokens(engine.submit()):
+            await response.write(json.dumps({"message": {"content": token}, "done": False}).encode() + b"\n")
+        await response.write(b'{"message": {"content": ""}, "done": true}\n')
+        return response
+
+    async def openai_chat(request):
+        await request.json()
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        async for token in _tokens(engine.submit()):
+            chunk = {"choices": [{"index": 0, "delta": {"content": token}}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def openai_completions(request):
+        body = await request.json()
+        prompts = body["prompt"] if isinstance(body["prompt"], list) else [body["prompt"]]
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        merged = asyncio.Queue()
+
+        async def forward(index, queue):
+            async for token in _tokens(queue):
+                merged.put_nowait((index, token))
+
+        forwarders = [asyncio.ensure_future(forward(i, engine.submit())) for i in range(len(prompts))]
+        done = asyncio.ensure_future(asyncio.gather(*forwarders))
+        done.add_done_callback(lambda _: merged.put_nowait(None))
+        while True:
+            item = await merged.get()
+            if item is None:
+                break
+            index, token = item
+            chunk = {"choices": [{"index": index, "text": token}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    app = web.Application()
+    app.router.add_post("/api/chat", ollama_chat)
+    app.router.add_post("/v1/chat/completions", openai_chat)
+    app.router.add_post("/v1/completions", openai_completions)
+    return app
+
+
+async def start(port, **engine_args):
+    """Run the fake backend in this event loop; returns (engine, stop coroutine function)."""
+    engine = Engine(**engine_args)
+    engine.start()
+    runner = web.AppRunner(make_app(engine))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+    async def stop():
+        await runner.cleanup()
+        await engine.stop()
+    return engine, stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--step-ms", type=float, default=20.0)
+    parser.add_argument("--slots", type=int, default=16)
+    parser.add_argument("--tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    async def serve():
+        await start(args.port, step_ms=args.step_ms, slots=args.slots, tokens=args.tokens)
+        print(f"Fake LLM on http://127.0.0.1:{args.port} (/api/chat, /v1/chat/completions, /v1/completions)")
+        await asyncio.Future()
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ echo "[ENTRYPOINT] Reading config..."
 
 OLLAMA_URI=$(awk -F= '/^ollama_uri/ {print $2}' /app/server.cfg | xargs)
 MODEL=$(awk -F= '/^model/ {print $2}' /app/server.cfg | xargs)
+EMBEDDING_MODEL=$(awk -F= '/^embedding_model/ {print $2}' /app/server.cfg | xargs)
 
 echo "[ENTRYPOINT] ollama_uri=${OLLAMA_URI}"
 echo "[ENTRYPOINT] model=${MODEL}"
@@ -17,6 +18,10 @@ if echo "$OLLAMA_URI" | grep -q "localhost"; then
     sleep 12  # give it a moment to start
     echo "[ENTRYPOINT] Detected localhost, pulling model: ${MODEL}"
     ollama pull "$MODEL"
+    if [ -n "$EMBEDDING_MODEL" ]; then
+        echo "[ENTRYPOINT] Pulling embedding model: ${EMBEDDING_MODEL}"
+        ollama pull "$EMBEDDING_MODEL"
+    fi
     }&
 
 else
@@ -1,14 +1,23 @@
 #!/usr/bin/env python3
 import asyncio
+import codecs
+import hashlib
 import json
+import math
 import subprocess
 import re
-import requests
 import os
 import ssl
 import websockets
-from bs4 import BeautifulSoup
+import aiohttp
+from contextlib import aclosing, asynccontextmanager
+from html.parser import HTMLParser
 import configparser
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter, OrderedDict, deque
 from datetime import datetime
 
 CONFIG_PATH = os.environ.get("SERVER_CONFIG_PATH", "server.cfg")
@@ -25,6 +34,32 @@ def load_config(path=CONFIG_PATH):
         "MODEL_NAME": config.get("ollama", "model", fallback="mistralai/mistral-7b-instruct:free"),
         "OLLAMA_URI": config.get("ollama", "ollama_uri", fallback="https://openrouter.ai/api/v1"),
         "API_KEY": config.get("ollama", "api_key", fallback=""),
+        "HTTP_CONNECTIONS": config.getint("ollama", "http_connections", fallback=32),
+        "LLM_CONNECT_TIMEOUT": config.getfloat("ollama", "connect_timeout", fallback=10.0),
+        "LLM_READ_TIMEOUT": config.getfloat("ollama", "read_timeout", fallback=120.0),
+        "SEARCH_TIMEOUT": config.getfloat("ollama", "search_timeout", fallback=10.0),
+        "FETCH_TIMEOUT": config.getfloat("ollama", "fetch_timeout", fallback=5.0),
+        "FETCH_MAX_BYTES": int(config.getfloat("ollama", "fetch_max_kb", fallback=1024) * 1024),
+        "SEARCH_DEADLINE": config.getfloat("ollama", "search_deadline", fallback=12.0),
+        "SEARCH_MIN_PAGES": config.getint("ollama", "search_min_pages", fallback=3),
+        "WEB_CACHE_ENTRIES": config.getint("ollama", "web_cache_entries", fallback=500),
+        "WEB_CACHE_BYTES": int(config.getfloat("ollama", "web_cache_mb", fallback=16) * 1024 * 1024),
+        "WEB_CACHE_PATH": config.get("ollama", "web_cache_path", fallback=""),
+        "SEARCH_CACHE_TTL": config.getint("ollama", "search_cache_ttl", fallback=3600),
+        "PAGE_CACHE_TTL": config.getint("ollama", "page_cache_ttl", fallback=86400),
+        "EMBEDDING_MODEL": config.get("ollama", "embedding_model", fallback=""),
+        "EMBEDDING_URI": config.get("ollama", "embedding_uri", fallback=""),
+        "CONTEXT_TOKENS": config.getint("ollama", "context_tokens", fallback=2048),
+        "TOKENIZER": config.get("ollama", "tokenizer", fallback="approx"),
+        "KEEP_ALIVE": config.get("ollama", "keep_alive", fallback="30m"),
+        "LLM_SLOTS": config.getint("ollama", "llm_slots", fallback=2),
+        "LLM_QUEUE": config.getint("ollama", "llm_queue", fallback=32),
+        "BATCH_WINDOW_MS": config.getint("ollama", "batch_window_ms", fallback=0),
+        "BATCH_MAX": config.getint("ollama", "batch_max", fallback=8),
+        "BATCH_COMPLETIONS_URI": config.get("ollama", "batch_completions_uri", fallback=""),
+        "RETRIEVAL_TOP_K": config.getint("ollama", "retrieval_top_k", fallback=6),
+        "CHUNK_CHARS": config.getint("ollama", "chunk_chars", fallback=600),
+        "PAGE_MAX_CHARS": config.getint("ollama", "page_max_chars", fallback=8000),
         "SYSTEM_TEXT": config.get("general", "system_text", fallback="ONLY answer in English language. The name is MULTIVAC. Provide succinct answers.")
     }
 
@@ -32,31 +67,288 @@ def debug_print(*args, **kwargs):
     if CONFIG and CONFIG["DEBUG"]:
         print("[DEBUG]", *args, **kwargs)
 
-def do_google_search(query: str) -> str:
+async def do_google_search(query: str) -> str:
     q = query.strip().replace(" ", "+")
     url = f"https://lite.duckduckgo.com/lite/?q={q}"
     debug_print("Executing search:", url)
+    process = None
     try:
-        result = subprocess.run(
-            ["lynx", "--dump", "--display_charset=utf-8", url],
-            capture_output=True, text=True, check=True
+        process = await asyncio.create_subprocess_exec(
+            "lynx", "--dump", "--display_charset=utf-8", url,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
         )
-        debug_print("Search result length:", len(result.stdout))
-        return result.stdout
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout=CONFIG["SEARCH_TIMEOUT"])
+        if process.returncode != 0:
+            raise RuntimeError(f"lynx exited with code {process.returncode}")
+        result = stdout.decode("utf-8", errors="ignore")
+        debug_print("Search result length:", len(result))
+        return result
     except Exception as e:
         debug_print("Search error:", e)
         return f"[Search Error] {e}"
+    finally:
+        if process is not None and process.returncode is None:
+            process.kill()
+            await process.wait()
 
-def fetch_web_content(url: str, max_chars: int = 4000) -> str:
+class WebCache:
+    """
+    LRU/TTL cache for search results and fetched page text, shared by all
+    AI requests. Concurrent misses for the same key share one fetch, so a
+    popular question searches once. With a path, entries are also kept in
+    SQLite and survive restarts; that store is only touched from the
+    default executor.
+    """
+    def __init__(self, max_entries, max_bytes, path=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}            # key -> asyncio.Task
+        self._waiters = Counter()      # asyncio.Task -> callers awaiting it
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._db = None
+        self._lock = threading.Lock()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            with self._lock, self._db:
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS web_cache ("
+                    " key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+                )
+
+    def get(self, key):
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        if item[0] < time.time():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return item[1]
+
+    def put(self, key, value, expires_at):
+        if len(value) > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (expires_at, value)
+        self._bytes += len(value)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self._bytes -= len(item[1])
+
+    def _load(self, key):
+        with self._lock, self._db:
+            return self._db.execute(
+                "SELECT expires_at, value FROM web_cache WHERE key = ? AND expires_at > ?",
+                (key, time.time())
+            ).fetchone()
+
+    def _save(self, key, value, expires_at):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM web_cache WHERE expires_at < ?", (time.time(),))
+            self._db.execute("INSERT OR REPLACE INTO web_cache VALUES (?, ?, ?)", (key, value, expires_at))
+
+    async def get_or_fetch(self, key, fetch, ttl, cacheable=None):
+        """
+        Return the cached string for `key`, or await `fetch()` once for all
+        concurrent callers and keep the result for `ttl` seconds, unless
+        cacheable(result) says otherwise. The shared fetch keeps running
+        (and fills the cache) even if the caller that started it is
+        cancelled, as long as another caller still waits for it; when the
+        last one is cancelled, so is the fetch.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load_or_fetch(key, fetch, ttl, cacheable))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._inflight.pop(key, None))
+        self._waiters[task] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                task.cancel()  # nobody left to wait for it; no-op once done
+
+    async def _load_or_fetch(self, key, fetch, ttl, cacheable):
+        loop = asyncio.get_running_loop()
+        if self._db is not None:
+            row = await loop.run_in_executor(None, self._load, key)
+            if row is not None:
+                self.put(key, row[1], row[0])
+                return row[1]
+        value = await fetch()
+        if cacheable is None or cacheable(value):
+            expires_at = time.time() + ttl
+            self.put(key, value, expires_at)
+            if self._db is not None:
+                await loop.run_in_executor(None, self._save, key, value, expires_at)
+        return value
+
+# Created in main() once the config is known.
+WEB_CACHE = None
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+async def cached_search(query: str) -> str:
+    return await WEB_CACHE.get_or_fetch(
+        "search:" + normalize_query(query),
+        lambda: do_google_search(query),
+        CONFIG["SEARCH_CACHE_TTL"],
+        cacheable=lambda result: not result.startswith("[Search Error]")
+    )
+
+async def cached_page(url: str, max_chars: int) -> str:
+    # Failed fetches raise and are not cached
+    return await WEB_CACHE.get_or_fetch(
+        f"page:{max_chars}:{url}",
+        lambda: fetch_web_content(url, max_chars=max_chars),
+        CONFIG["PAGE_CACHE_TTL"]
+    )
+
+class ParagraphExtractor(HTMLParser):
+    """
+    Incremental HTML-to-text: collects the text of <p> elements from fed
+    chunks, skipping scripts, styles and page chrome (nav, header, footer,
+    ...). Sets `full` once max_chars of text are collected, so the caller
+    can stop downloading.
+    """
+    SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "nav",
+                 "header", "footer", "aside", "form", "button", "select"}
+    # Block elements that implicitly end an open <p>
+    BLOCK_TAGS = {"p", "div", "ul", "ol", "table", "section", "article",
+                  "blockquote", "pre", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+    def __init__(self, max_chars):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.paragraphs = []
+        self.chars = 0
+        self.full = False
+        self._skip_depth = 0
+        self._current = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self._end_paragraph()
+            if tag == "p":
+                self._current = []
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK_TAGS:
+            self._end_paragraph()
+
+    def handle_data(self, data):
+        if self._current is not None and not self._skip_depth:
+            self._current.append(data)
+
+    def _end_paragraph(self):
+        if self._current is None:
+            return
+        text = " ".join("".join(self._current).split())
+        self._current = None
+        if text:
+            self.paragraphs.append(text)
+            self.chars += len(text) + 1
+            self.full = self.chars > self.max_chars
+
+    def close(self):
+        super().close()
+        self._end_paragraph()
+
+    def text(self):
+        return " ".join(self.paragraphs)
+
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+async def fetch_web_content(url: str, max_chars: int = 4000) -> str:
+    """
+    Paragraph text of `url`, at most max_chars. The body is parsed as it
+    arrives and the download stops once enough text is collected or
+    FETCH_MAX_BYTES were read. Raises on network errors and non-HTML pages.
+    """
     headers = {'User-Agent': 'Mozilla/5.0'}
+    parser = ParagraphExtractor(max_chars)
+    async with HTTP_SESSION.get(
+        url, headers=headers, timeout=aiohttp.ClientTimeout(total=CONFIG["FETCH_TIMEOUT"])
+    ) as response:
+        response.raise_for_status()
+        if response.content_type not in HTML_CONTENT_TYPES:
+            raise ValueError(f"not an HTML page ({response.content_type})")
+        if (response.content_length or 0) > CONFIG["FETCH_MAX_BYTES"]:
+            raise ValueError(f"page too large ({response.content_length} bytes)")
+        try:
+            decoder = codecs.getincrementaldecoder(response.charset or "utf-8")(errors="ignore")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        received = 0
+        async for chunk in response.content.iter_chunked(16384):
+            received += len(chunk)
+            parser.feed(decoder.decode(chunk))
+            if parser.full:
+                break
+            if received >= CONFIG["FETCH_MAX_BYTES"]:
+                debug_print("Fetch size limit reached for", url)
+                break
+        # Leaving early drops the connection instead of reading the rest
+    parser.close()
+    text = parser.text()
+    return text[:max_chars] + "..." if len(text) > max_chars else text
+
+async def search_and_fetch(query: str, limit: int = 5, max_chars: int = 2000) -> list:
+    """
+    Search for `query` and fetch the top `limit` results concurrently.
+    Returns (url, text) pairs in search rank order. Stops
+    waiting once SEARCH_MIN_PAGES pages came back with text, or when
+    SEARCH_DEADLINE seconds have passed since the search started; pages
+    still loading then are cancelled, unless another request is waiting
+    for the same page.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + CONFIG["SEARCH_DEADLINE"]
+    search_result = await cached_search(query)
+    urls = process_search_results(search_result, limit=limit)
+
+    tasks = {asyncio.ensure_future(cached_page(url, max_chars)): url for url in urls}
+    contents = {}
+    pending = set(tasks)
     try:
-        response = requests.get(url, headers=headers, timeout=5)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        text = " ".join(p.get_text() for p in soup.find_all('p'))
-        return text[:max_chars] + "..." if len(text) > max_chars else text
-    except Exception as e:
-        debug_print("Fetch error for", url, ":", e)
-        return f"[Fetch Error] {e}"
+        while pending and len(contents) < CONFIG["SEARCH_MIN_PAGES"]:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                debug_print("Search deadline reached, abandoning", len(pending), "pages")
+                break
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                url = tasks[task]
+                try:
+                    content = task.result()
+                except Exception as e:
+                    debug_print("Fetch error for", url, ":", e)
+                    continue
+                if content.strip():
+                    contents[url] = content
+    finally:
+        for task in pending:
+            task.cancel()
+    return [(url, contents[url]) for url in urls if url in contents]
 
 def process_search_results(search_output: str, limit: int = 5) -> list:
     urls = re.findall(r'https?://[^\s]+', search_output)
@@ -77,7 +369,7 @@ def is_openrouter_style_uri(uri):
 def adjust_uri_for_openrouter(uri):
     if is_openrouter_style_uri(uri) and not uri.endswith("/chat/completions"):
         return uri.rstrip("/") + "/chat/completions"
-    return uri + "/generate" if uri.endswith("/api") else uri
+    return uri + "/chat" if uri.endswith("/api") else uri
 
 def ollama_prompt_to_messages(prompt):
     lines = prompt.split("\n")
@@ -108,137 +400,966 @@ def ollama_prompt_to_messages(prompt):
         messages.append({"role": current_role, "content": "\n".join(current_content).strip()})
     return messages
 
+# Shared HTTP client with a keep-alive connection pool, created in main()
+HTTP_SESSION = None
+
+def llm_headers():
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {CONFIG['API_KEY']}",
+        "HTTP-Referer": "https://github.com/ballerburg9005/wikipedia-live-telnet",
+        "X-Title": "wikipedia-live-telnet"
+    }
+
 async def stream_ollama_response(prompt: str, model: str):
+    """
+    Stream the completion for `prompt` token by token, from Ollama's
+    /api/chat (NDJSON) or an OpenAI-compatible /chat/completions (SSE).
+    Closing the generator early (client cancelled or went away) closes the
+    upstream connection, which stops the generation there.
+
+    With LLM_BATCHER set, the prompt goes through it instead.
+    """
+    if LLM_BATCHER is not None:
+        async with aclosing(LLM_BATCHER.stream(prompt, model)) as tokens:
+            async for token in tokens:
+                yield token
+        return
+
     uri = adjust_uri_for_openrouter(CONFIG["OLLAMA_URI"])
-    payload = {
-        "model": model,
-        "messages": ollama_prompt_to_messages(prompt),
-        "stream": True,
-        "max_tokens": 256,
-        "temperature": 0.0,
-        "top_p": 0.8,
-    }
-    headers = [
-        "-H", "Content-Type: application/json",
-        "-H", f"Authorization: Bearer {CONFIG['API_KEY']}",
-        "-H", "HTTP-Referer: https://github.com/ballerburg9005/wikipedia-live-telnet",
-        "-H", "X-Title: wikipedia-live-telnet"
-    ]
+    openai_style = is_openrouter_style_uri(uri)
+    if openai_style:
+        payload = {
+            "model": model,
+            "messages": ollama_prompt_to_messages(prompt),
+            "stream": True,
+            "max_tokens": MAX_COMPLETION_TOKENS,
+            "temperature": 0.0,
+            "top_p": 0.8,
+        }
+    else:
+        payload = {
+            "model": model,
+            "messages": ollama_prompt_to_messages(prompt),
+            "stream": True,
+            "options": {
+                "num_predict": MAX_COMPLETION_TOKENS, "num_ctx": CONFIG["CONTEXT_TOKENS"],
+                "temperature": 0.0, "top_p": 0.8
+            },
+            # keep the model, and with it the cached prompt prefix, loaded
+            # between questions
+            "keep_alive": CONFIG["KEEP_ALIVE"],
+        }
     debug_print("Payload:", json.dumps(payload, indent=2))
-    curl_cmd = ["curl", "-sS", "-X", "POST", uri] + headers + ["-d", json.dumps(payload)]
-    debug_print("Curl command:", " ".join(curl_cmd))
-    
-    process = await asyncio.create_subprocess_exec(
-        *curl_cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
+
+    finished = False
+    response = await HTTP_SESSION.post(uri, json=payload, headers=llm_headers())
+    try:
+        if response.status != 200:
+            body = await response.text()
+            debug_print("LLM HTTP error:", response.status, body)
+            yield f"[Error] LLM returned HTTP {response.status}: {body[:200]}"
+            return
+
+        async for line_bytes in response.content:
+            line = line_bytes.decode("utf-8", errors="ignore").strip()
+            if not line or line.startswith(":"):
+                continue
+            if line.startswith("data: "):
+                line = line[6:].strip()
+            if line == "[DONE]":
+                debug_print("Received DONE signal")
+                break
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as je:
+                debug_print("JSON error:", je, "Line:", line)
+                yield f"[Unparseable chunk] {line}"
+                continue
+            debug_print("Parsed chunk:", data)
+            if openai_style:
+                content = data["choices"][0]["delta"].get("content", "") if data.get("choices") else ""
+            else:
+                content = data.get("message", {}).get("content", "")
+            if content:
+                debug_print("Yielding token:", repr(content))
+                yield content
+            if data.get("done"):
+                break
+        finished = True
+    finally:
+        if finished:
+            response.release()
+        else:
+            # Don't return a half-read stream to the pool: drop the
+            # connection so the backend stops generating.
+            response.close()
+
+class PromptBatcher:
+    """
+    Optional batching of generations across users ([ollama]
+    batch_window_ms and batch_completions_uri). Prompts arriving within the
+    window, up to `max_size`, go to the OpenAI-compatible /completions
+    endpoint at `completions_uri` (e.g. vLLM) as one request with the list
+    of prompts; the streamed choices are handed back to each caller by
+    their index.
+
+    Only prompts LLM_SCHEDULER has admitted reach the batcher, so a batch
+    never holds more than llm_slots prompts.
+
+    A caller that stops reading only leaves its batch; the shared request
+    is dropped once nobody reads it anymore.
+    """
+    class _Request:
+        def __init__(self, prompt, model):
+            self.prompt = prompt
+            self.model = model
+            self.ready = asyncio.get_running_loop().create_future()
+            self.tokens = asyncio.Queue()
+            self.batch = None  # (task, requests) once dispatched
+            self.dropped = False
+
+    def __init__(self, window, max_size, completions_uri):
+        self.window = window
+        self.max_size = max(1, max_size)
+        self.completions_uri = completions_uri
+        self._pending = []
+        self._timer = None
+
+    async def stream(self, prompt: str, model: str):
+        request = self._Request(prompt, model)
+        self._pending.append(request)
+        if len(self._pending) >= self.max_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._dispatch)
+        try:
+            await request.ready
+            while True:
+                token = await request.tokens.get()
+                if token is None:
+                    return
+                yield token
+        finally:
+            request.dropped = True
+            if request in self._pending:
+                self._pending.remove(request)
+            if request.batch is not None:
+                task, requests = request.batch
+                if all(r.dropped for r in requests):
+                    task.cancel()
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        debug_print("Dispatching batch of", len(pending), "prompts")
+        by_model = {}
+        for request in pending:
+            by_model.setdefault(request.model, []).append(request)
+        for requests in by_model.values():
+            task = asyncio.ensure_future(self._run_batch(requests))
+            for request in requests:
+                request.batch = (task, requests)
+        for request in pending:
+            if not request.ready.done():
+                request.ready.set_result(None)
+
+    async def _run_batch(self, requests):
+        """One streamed /completions request for all prompts; choices go to requests[index]."""
+        payload = {
+            "model": requests[0].model,
+            "prompt": [request.prompt for request in requests],
+            "stream": True,
+            "max_tokens": MAX_COMPLETION_TOKENS,
+            "temperature": 0.0,
+            "top_p": 0.8,
+            # raw prompts: don't let the model write the next turn itself
+            "stop": ["\nUser:", "\nSystem:"],
+        }
+        response = None
+        finished = False
+        try:
+            response = await HTTP_SESSION.post(self.completions_uri, json=payload, headers=llm_headers())
+            if response.status != 200:
+                body = await response.text()
+                debug_print("LLM HTTP error:", response.status, body)
+                for request in requests:
+                    request.tokens.put_nowait(f"[Error] LLM returned HTTP {response.status}: {body[:200]}")
+                return
+            async for line_bytes in response.content:
+                line = line_bytes.decode("utf-8", errors="ignore").strip()
+                if not line.startswith("data: "):
+                    continue
+                line = line[6:].strip()
+                if line == "[DONE]":
+                    break
+                try:
+                    data = json.loads(line)
+                except json.JSONDecodeError as je:
+                    debug_print("JSON error:", je, "Line:", line)
+                    continue
+                for choice in data.get("choices", []):
+                    index = choice.get("index", 0)
+                    if choice.get("text") and 0 <= index < len(requests) and not requests[index].dropped:
+                        requests[index].tokens.put_nowait(choice["text"])
+            finished = True
+        except Exception as e:
+            debug_print("Batch request failed:", type(e).__name__, e)
+            for request in requests:
+                request.tokens.put_nowait(f"[Error] {type(e).__name__}: {e}")
+        finally:
+            if response is not None:
+                if finished:
+                    response.release()
+                else:
+                    response.close()
+            for request in requests:
+                request.tokens.put_nowait(None)
+
+# Created in main() when [ollama] batch_window_ms and batch_completions_uri are set
+LLM_BATCHER = None
+
+# Longest answer we ask the model for, in tokens
+MAX_COMPLETION_TOKENS = 256
+# Role prefixes and separators the prompt adds around its parts
+PROMPT_OVERHEAD_TOKENS = 16
+
+def approx_token_count(text: str) -> int:
+    """About four characters per token, close enough for English text."""
+    return (len(text) + 3) // 4
+
+# Tokenizers by name, selected with [ollama] tokenizer. Each maps a text
+# to its token count; register the model's real tokenizer here if exact
+# budgets matter.
+TOKENIZERS = {"approx": approx_token_count}
+
+def count_tokens(text: str) -> int:
+    return TOKENIZERS.get(CONFIG["TOKENIZER"], approx_token_count)(text)
+
+# Conversation speakers as sent by the telnet server -> prompt roles
+HISTORY_ROLES = {"You": "User", "AI": "Assistant"}
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+def compact_history(conversation: list, budget: int) -> list:
+    """
+    Prompt lines for the earlier turns of a conversation within `budget`
+    tokens. The newest turns are kept verbatim; older ones are cut to
+    their first sentence, and dropped once even that does not fit.
+    """
+    lines = []
+    used = 0
+    for msg in reversed(conversation):
+        role = HISTORY_ROLES.get(msg.get("speaker"))
+        if role is None:
+            continue  # error notices are not part of the dialogue
+        text = " ".join(str(msg.get("text", "")).split())
+        line = f"{role}: {text}"
+        if used + count_tokens(line) > budget:
+            line = f"{role}: {SENTENCE_END_RE.split(text, 1)[0][:160]}"
+            if used + count_tokens(line) > budget:
+                break
+        lines.append(line)
+        used += count_tokens(line)
+    return lines[::-1]
+
+def chunk_text(text: str, chunk_chars: int) -> list:
+    """
+    Split text into (offset, passage) pairs of about chunk_chars characters
+    on word boundaries, each overlapping the previous one by a few words.
+    """
+    words = [(m.start(), m.group(0)) for m in re.finditer(r"\S+", text)]
+    chunks = []
+    start = 0
+    while start < len(words):
+        end, size = start, 0
+        while end < len(words) and (size == 0 or size + len(words[end][1]) < chunk_chars):
+            size += len(words[end][1]) + 1
+            end += 1
+        chunks.append((words[start][0], " ".join(w for _, w in words[start:end])))
+        if end >= len(words):
+            break
+        start = max(start + 1, end - CHUNK_OVERLAP_WORDS)
+    return chunks
+
+CHUNK_OVERLAP_WORDS = 12
+EMBED_BATCH = 32
+EMBEDDING_TIMEOUT = 30
+# After a failed embedding call, use lexical ranking for this many seconds
+EMBEDDING_RETRY_AFTER = 60
+EMBEDDINGS_DOWN_UNTIL = 0.0
+
+def embedding_endpoint(uri):
+    uri = uri.rstrip("/")
+    if is_openrouter_style_uri(uri):
+        return uri + "/embeddings"
+    return uri + "/embed" if uri.endswith("/api") else uri
+
+async def embed_texts(texts: list) -> list:
+    """
+    Unit-length embedding vectors for `texts` from EMBEDDING_MODEL, via
+    Ollama's /api/embed or an OpenAI-compatible /embeddings endpoint.
+    Vectors are float32 arrays: 4 bytes per dimension instead of a boxed
+    float, which matters for the indexes PASSAGE_INDEXES keeps.
+    """
+    uri = embedding_endpoint(CONFIG["EMBEDDING_URI"] or CONFIG["OLLAMA_URI"])
+    headers = {"Authorization": f"Bearer {CONFIG['API_KEY']}"}
+    vectors = []
+    for i in range(0, len(texts), EMBED_BATCH):
+        payload = {"model": CONFIG["EMBEDDING_MODEL"], "input": texts[i:i + EMBED_BATCH]}
+        async with HTTP_SESSION.post(
+            uri, json=payload, headers=headers,
+            timeout=aiohttp.ClientTimeout(total=EMBEDDING_TIMEOUT)
+        ) as response:
+            response.raise_for_status()
+            data = await response.json()
+        if "embeddings" in data:
+            batch = data["embeddings"]
+        else:
+            batch = [item["embedding"] for item in sorted(data["data"], key=lambda item: item["index"])]
+        for vector in batch:
+            norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+            vectors.append(array("f", (x / norm for x in vector)))
+    return vectors
+
+# Letters and digits of any script, for articles in every default_language
+WORD_RE = re.compile(r"\w+")
+
+def lexical_scores(query: str, chunks: list) -> list:
+    """TF-IDF style overlap of query words with each chunk."""
+    terms = {w for w in WORD_RE.findall(query.lower()) if len(w) > 2}
+    chunk_terms = [Counter(WORD_RE.findall(chunk.lower())) for chunk in chunks]
+    idf = {t: math.log(1 + len(chunks) / (1 + sum(1 for ct in chunk_terms if t in ct))) for t in terms}
+    return [sum(idf[t] * (1 + math.log(ct[t])) for t in terms if ct[t]) for ct in chunk_terms]
+
+class PassageIndex:
+    """
+    Chunks of a text (with their character offsets) and, if the embedding
+    model was reachable, their vectors. Without vectors, passages are
+    ranked lexically.
+    """
+    def __init__(self, chunks, vectors=None):
+        self.offsets = [offset for offset, _ in chunks]
+        self.chunks = [chunk for _, chunk in chunks]
+        self.vectors = vectors
+
+    async def ranked(self, query: str) -> list:
+        """Indices of all passages, most relevant to `query` first."""
+        scores = None
+        if self.vectors is not None:
+            try:
+                query_vector = (await embed_texts([query]))[0]
+                scores = [sum(a * b for a, b in zip(query_vector, v)) for v in self.vectors]
+            except Exception as e:
+                debug_print("Query embedding failed, ranking lexically:", e)
+        if scores is None:
+            scores = lexical_scores(query, self.chunks)
+        return sorted(range(len(self.chunks)), key=lambda i: scores[i], reverse=True)
+
+    def pick(self, order, budget, limit=None) -> list:
+        """
+        Take passages in `order` while they fit into `budget` tokens (and
+        `limit` passages); return their indices in text order.
+        """
+        chosen, used = [], 0
+        for i in order:
+            if limit is not None and len(chosen) >= limit:
+                break
+            cost = count_tokens(self.chunks[i]) + 2
+            if i in chosen or used + cost > budget:
+                continue
+            chosen.append(i)
+            used += cost
+        return sorted(chosen)
+
+async def build_passage_index(chunks: list) -> PassageIndex:
+    global EMBEDDINGS_DOWN_UNTIL
+    vectors = None
+    if CONFIG["EMBEDDING_MODEL"] and chunks and time.time() >= EMBEDDINGS_DOWN_UNTIL:
+        try:
+            vectors = await embed_texts([chunk for _, chunk in chunks])
+        except Exception as e:
+            debug_print("Embedding failed, falling back to lexical retrieval:", e)
+            EMBEDDINGS_DOWN_UNTIL = time.time() + EMBEDDING_RETRY_AFTER
+    return PassageIndex(chunks, vectors)
+
+class PassageIndexCache:
+    """
+    LRU of PassageIndex per article (title plus a digest of the text), so
+    follow-up questions about the same article don't embed it again.
+    Concurrent builds for the same article share one.
+    """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+
+    async def get(self, title: str, text: str) -> PassageIndex:
+        key = (title, hashlib.sha1(text.encode("utf-8")).hexdigest())
+        index = self._entries.get(key)
+        if index is not None:
+            self._entries.move_to_end(key)
+            return index
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(build_passage_index(chunk_text(text, CONFIG["CHUNK_CHARS"])))
+            self._inflight[key] = task
+
+            def _done(t, key=key):
+                self._inflight.pop(key, None)
+                if t.cancelled() or t.exception() is not None:
+                    return
+                # A lexical-only index from a failed embedding call is not kept
+                if t.result().vectors is not None or not CONFIG["EMBEDDING_MODEL"]:
+                    self._entries[key] = t.result()
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            task.add_done_callback(_done)
+        return await asyncio.shield(task)
+
+PASSAGE_INDEXES = PassageIndexCache(32)
+
+def page_char_range(context: str, page_index, page_size):
+    """Character span of the page the user is reading in the wrapped article."""
+    if page_index is None or not page_size:
+        return None
+    lines = context.split("\n")
+    first = min(len(lines), page_index * page_size)
+    last = min(len(lines), first + page_size)
+    start = sum(len(line) + 1 for line in lines[:first])
+    return start, start + sum(len(line) + 1 for line in lines[first:last])
+
+def select_article_passages(index: PassageIndex, order: list, first: int, context: str, budget: int,
+                            page_index=None, page_size=None) -> str:
+    """
+    Passages of a long article for one question, within `budget` tokens:
+    those of the page the user is reading, then the best ones in `order`.
+    Passages before `first` are already in the prompt prefix.
+    """
+    near = []
+    page = page_char_range(context, page_index, page_size)
+    if page is not None:
+        # a passage ends after the next one starts
+        ends = index.offsets[1:] + [len(context)]
+        near = [i for i, offset in enumerate(index.offsets) if offset < page[1] and ends[i] > page[0]]
+    order = [i for i in near + order if i >= first]
+    best = index.pick(order, budget, len(near) + CONFIG["RETRIEVAL_TOP_K"])
+    return "\n...\n".join(index.chunks[i] for i in best)
+
+class PromptPrefixCache:
+    """
+    The prompt prefix (system text plus article lead) for each article,
+    built once and then reused byte for byte, so that Ollama or the
+    OpenAI-compatible backend can serve it from its KV/prefix cache for
+    every question about the article, from any user.
+
+    Also remembers which prefix each user_id used last, to tell (and log)
+    how often a question continues on a warm prefix.
+    """
+    def __init__(self, max_entries, max_sessions):
+        self.max_entries = max_entries
+        self.max_sessions = max_sessions
+        self._entries = OrderedDict()   # key -> (prefix, index, first)
+        self._sessions = OrderedDict()  # user_id -> key
+        self.reused = 0
+        self.changed = 0
+
+    async def get(self, system_text: str, title: str, context: str, budget: int):
+        """
+        Return (key, (prefix, index, first)). Articles up to `budget` tokens
+        go into the prefix whole (index is None); longer ones contribute
+        their lead, up to half of it, and `first` is the first passage
+        after the lead.
+        """
+        key = (hashlib.sha1(system_text.encode("utf-8")).hexdigest(), title,
+               hashlib.sha1(context.encode("utf-8")).hexdigest(), budget)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return key, entry
+        index, first = None, 0
+        if not context:
+            prefix = f"System: {system_text}"
+        elif count_tokens(context) <= budget:
+            prefix = f"System: {system_text}\nArticle Context ({title}):\n{context}"
+        else:
+            index = await PASSAGE_INDEXES.get(title, context)
+            while first + 1 < len(index.offsets) and count_tokens(context[:index.offsets[first + 1]]) <= budget // 2:
+                first += 1
+            lead = context[:index.offsets[first]].strip()
+            prefix = f"System: {system_text}\nArticle Context ({title}, beginning):\n{lead}"
+        entry = (prefix, index, first)
+        # Like PassageIndexCache, don't keep a lexical-only index from a failed embedding call
+        if index is None or index.vectors is not None or not CONFIG["EMBEDDING_MODEL"]:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return key, entry
+
+    def note_session(self, user_id, key):
+        """Record that user_id asked with prefix `key`; True if it is the one used last time."""
+        reused = self._sessions.get(user_id) == key
+        self._sessions[user_id] = key
+        self._sessions.move_to_end(user_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        if reused:
+            self.reused += 1
+        else:
+            self.changed += 1
+        return reused
+
+PROMPT_PREFIXES = PromptPrefixCache(64, 1000)
+
+async def select_web_passages(pages: list, query: str, budget: int) -> list:
+    """The top passages across fetched (url, text) pages, as prompt blocks."""
+    chunks, sources = [], []
+    for url, content in pages:
+        for offset, chunk in chunk_text(content, CONFIG["CHUNK_CHARS"]):
+            chunks.append((offset, chunk))
+            sources.append(url)
+    index = await build_passage_index(chunks)
+    order = await index.ranked(query)
+    best = index.pick(order, budget, CONFIG["RETRIEVAL_TOP_K"])
+    return [f"Content from {sources[i]}:\n{index.chunks[i]}\n" for i in best]
+
+class TokenBatcher:
+    """
+    Groups streamed tokens into websocket frames. A token arriving after a
+    quiet period goes out at once, so a slow model adds no latency; while
+    tokens arrive faster, they are collected and sent once per window.
+
+    The window is the client's batch_ms, widened for slow terminal links
+    (bytes_per_sec as reported by the telnet server): there is no point in
+    sending frames faster than the terminal can show a few words.
+    """
+    DEFAULT_BATCH_MS = 40
+    LINK_FRAME_BYTES = 32
+    MAX_WINDOW = 0.5
+
+    def __init__(self, send, batch_ms=None, bytes_per_sec=None):
+        self.send = send
+        window = (batch_ms if batch_ms is not None else self.DEFAULT_BATCH_MS) / 1000.0
+        if bytes_per_sec:
+            window = max(window, self.LINK_FRAME_BYTES / bytes_per_sec)
+        self.window = min(self.MAX_WINDOW, max(0.0, window))
+        self._parts = []
+        self._last_sent = 0.0
+        self._timer = None
+
+    async def add(self, text):
+        self._parts.append(text)
+        if self._timer is not None:
+            return
+        loop = asyncio.get_running_loop()
+        wait = self._last_sent + self.window - loop.time()
+        if wait <= 0:
+            await self.flush()
+        else:
+            self._timer = asyncio.ensure_future(self._flush_later(wait))
+
+    async def _flush_later(self, wait):
+        await asyncio.sleep(wait)
+        self._timer = None
+        try:
+            await self.flush()
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def flush(self):
+        self.close()
+        if not self._parts:
+            return
+        text = "".join(self._parts)
+        self._parts.clear()
+        self._last_sent = asyncio.get_running_loop().time()
+        await self.send(text)
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+def batched_emit(emit, data):
+    """
+    Wrap emit(kind, text) so that tokens are batched per the request's
+    batch_ms/bytes_per_sec; other frames flush pending tokens first.
+    Returns (emit, batcher); the caller flushes or closes the batcher.
+    """
+    batcher = TokenBatcher(
+        lambda text: emit("token", text),
+        data.get("batch_ms"), data.get("bytes_per_sec")
     )
-    
-    if not process.stdout:
-        debug_print("No STDOUT from process!")
-        yield "[Error] No STDOUT from LLM"
+
+    async def emit_batched(kind, text=""):
+        if kind == "token":
+            await batcher.add(text)
+        else:
+            await batcher.flush()
+            await emit(kind, text)
+
+    return emit_batched, batcher
+
+class SearchTagParser:
+    """
+    Finds <search>query</search> in the model's token stream, one character
+    at a time. feed() returns the text that can go to the client right
+    away: everything except a possible start of the tag, which is held back
+    until it turns out to be something else. Once the tag closes, `query`
+    is set and the rest of the stream is ignored.
+    """
+    OPEN = "<search>"
+    CLOSE = "</search>"
+
+    def __init__(self):
+        self.query = None
+        self._in_tag = False
+        self._matched = 0  # characters of OPEN or CLOSE matched so far
+        self._query = []
+
+    def feed(self, token: str) -> str:
+        out = []
+        for ch in token:
+            if self.query is not None:
+                break
+            if self._in_tag:
+                self._query.append(ch)
+                if ch == self.CLOSE[self._matched]:
+                    self._matched += 1
+                else:
+                    # "<" starts both tags and appears nowhere else in them
+                    self._matched = 1 if ch == "<" else 0
+                if self._matched == len(self.CLOSE):
+                    self.query = "".join(self._query[:-len(self.CLOSE)]).strip()
+            elif ch == self.OPEN[self._matched]:
+                self._matched += 1
+                if self._matched == len(self.OPEN):
+                    self._in_tag = True
+                    self._matched = 0
+            else:
+                out.append(self.OPEN[:self._matched])
+                self._matched = 1 if ch == "<" else 0
+                if not self._matched:
+                    out.append(ch)
+        return "".join(out)
+
+    def flush(self) -> str:
+        """At the end of the stream: held-back text that was not a tag after all."""
+        if self._in_tag or self.query is not None:
+            return ""
+        held, self._matched = self.OPEN[:self._matched], 0
+        return held
+
+class QueueFull(Exception):
+    pass
+
+class LLMScheduler:
+    """
+    Admission control for generations: at most `slots` run at once (0 =
+    no limit), up to `max_waiting` more wait. Waiting requests are
+    admitted round-robin across users, first come first served per user,
+    so one user asking several questions can't hold up the others.
+
+    A waiter that is cancelled (the telnet client went away or pressed
+    q/c) leaves the queue before it ever reaches the model.
+    """
+    class _Waiter:
+        def __init__(self):
+            self.positions = asyncio.Queue()
+            self.position = None
+
+    def __init__(self, slots, max_waiting):
+        self.slots = slots
+        self.max_waiting = max_waiting
+        self.running = 0
+        self.waiting = 0
+        self._queues = OrderedDict()  # user -> deque of _Waiter, in turn order
+
+    def _order(self):
+        """Waiters in the order they will be admitted."""
+        queues = list(self._queues.values())
+        order = []
+        for i in range(max((len(q) for q in queues), default=0)):
+            order.extend(q[i] for q in queues if i < len(q))
+        return order
+
+    def _update(self):
+        while self.running < self.slots and self._queues:
+            user, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            if queue:
+                self._queues.move_to_end(user)
+            else:
+                del self._queues[user]
+            self.waiting -= 1
+            self.running += 1
+            waiter.positions.put_nowait(0)
+        for position, waiter in enumerate(self._order(), 1):
+            if waiter.position != position:
+                waiter.position = position
+                waiter.positions.put_nowait(position)
+
+    async def acquire(self, user, notify):
+        """
+        Wait for a slot. While queued, notify(position) is awaited whenever
+        the position (1 = next) changes, and notify(0) once admitted.
+        """
+        if self.slots <= 0 or (self.running < self.slots and not self._queues):
+            self.running += 1
+            return
+        if self.waiting >= self.max_waiting:
+            raise QueueFull()
+        waiter = self._Waiter()
+        self._queues.setdefault(user, deque()).append(waiter)
+        self.waiting += 1
+        self._update()
+        try:
+            while True:
+                position = await waiter.positions.get()
+                while position and not waiter.positions.empty():
+                    position = waiter.positions.get_nowait()
+                await notify(position)
+                if position == 0:
+                    return
+        except BaseException:
+            queue = self._queues.get(user)
+            if queue is not None and waiter in queue:
+                queue.remove(waiter)
+                if not queue:
+                    del self._queues[user]
+                self.waiting -= 1
+                self._update()
+            else:
+                self.release()
+            raise
+
+    def release(self):
+        self.running -= 1
+        self._update()
+
+    @asynccontextmanager
+    async def slot(self, user, notify):
+        await self.acquire(user, notify)
+        try:
+            yield
+        finally:
+            self.release()
+
+# Created in main() from [ollama] llm_slots/llm_queue
+LLM_SCHEDULER = None
+
+async def answer_question(data, emit):
+    """
+    Answer one request (the telnet server's payload) and stream the result
+    through emit(kind, text), where kind is "token", "status" or "error".
+    """
+    if data.get("auth_token", "") != CONFIG["AUTH_TOKEN"]:
+        debug_print("Auth failed. Received:", data.get("auth_token"), "Expected:", CONFIG["AUTH_TOKEN"])
+        await emit("error", "[Error] Invalid or missing auth token.")
         return
+    debug_print("Auth successful")
 
-    async for line_bytes in process.stdout:
-        line = line_bytes.decode("utf-8", errors="ignore").strip()
-        if not line or line.startswith(":"):
-            continue
-        if line.startswith("data: "):
-            line = line[6:].strip()
-        if line == "[DONE]":
-            debug_print("Received DONE signal")
-            break
+    conversation = [msg for msg in data.get("conversation", []) if isinstance(msg, dict)]
+    context = data.get("context", "")
+    new_question = data.get("new_question", "")
+    # The telnet server's conversation already ends with the new question
+    if conversation and conversation[-1].get("text") == new_question:
+        conversation = conversation[:-1]
+
+    system_text = (
+        "Your name is MULTIVAC, a (non-fictional) universal knowledge tool, for vintage machine collectors connecting via telnet, acting as a web browser replacement (since old machines have no web browsers). "
+        "Tone: concise, technical, professional, 80s corporate mainframe. "
+        "ONLY answer in natural English language. NEVER repeat the system message, user prompt, NEVER fabricate conversations or repeat yourself. "
+        "Primary goal: Answer from provided context (e.g., Wikipedia article) if available and sufficient. "
+        "If context is insufficient or absent, or for real-time/factual queries outside the context, immediately trigger a web search with <search>query</search>. "
+        "When context is a Wikipedia article, answer strictly from that data unless it lacks the required info. "
+        "Provide succinct, accurate answers using only provided context or search results. No speculation or chit-chat.\n" +
+        CONFIG["SYSTEM_TEXT"]
+    )
+
+    # Prompt budget: what the context window leaves after the answer and
+    # the system text. The layout goes from stable to volatile so that
+    # backends can reuse cached prefixes: system text and the article
+    # (whole if it takes up to half the budget, else its lead), earlier
+    # turns (up to a quarter), then the passages picked for this question
+    # and the question itself. The shares don't depend on the question,
+    # which keeps the prefix byte-identical across questions and users.
+    budget = CONFIG["CONTEXT_TOKENS"] - MAX_COMPLETION_TOKENS - PROMPT_OVERHEAD_TOKENS - count_tokens(system_text)
+    title = data.get("title") or ""
+    prefix_key, (prefix, index, first) = await PROMPT_PREFIXES.get(system_text, title, context, max(0, budget // 2))
+    if PROMPT_PREFIXES.note_session(data.get("user_id"), prefix_key):
+        debug_print("Prompt prefix reused for user", data.get("user_id"))
+    history_lines = compact_history(conversation, max(0, budget // 4))
+
+    question = f"User: {new_question}"
+    if index is not None:
+        rest = (budget - count_tokens(prefix) + count_tokens(system_text) - count_tokens(new_question)
+                - sum(count_tokens(line) for line in history_lines))
+        passages = select_article_passages(
+            index, await index.ranked(new_question), first, context, max(0, rest),
+            data.get("page_index"), data.get("page_size")
+        )
+        if passages:
+            question = f"User: More of the article:\n{passages}\n\nQuestion: {new_question}"
+
+    prompt_lines = [prefix] + history_lines + [question, "Assistant:"]
+    full_prompt = "\n".join(prompt_lines)
+    debug_print("Initial prompt:\n", full_prompt)
+    prompt_tokens = count_tokens(full_prompt)
+    completion = []
+
+    async def notify(position):
+        # queue position, shown in place of the spinner; 0 once admitted
+        await emit("queue", str(position))
+
+    # Each generation waits for a model slot; the web search between them
+    # doesn't hold one.
+    user_id = data.get("user_id")
+    tag_parser = SearchTagParser()
+    try:
+        async with LLM_SCHEDULER.slot(user_id, notify):
+            async with aclosing(stream_ollama_response(full_prompt, CONFIG["MODEL_NAME"])) as tokens:
+                async for token in tokens:
+                    text = tag_parser.feed(token)
+                    if text:
+                        completion.append(text)
+                        await emit("token", text)
+                    if tag_parser.query is not None:
+                        # leaving the stream stops this generation upstream
+                        break
+            text = tag_parser.flush()
+            if text:
+                completion.append(text)
+                await emit("token", text)
+
+        search_query = tag_parser.query
+        if search_query is not None:
+            debug_print("Search triggered:", search_query)
+            # the client sets aside what was streamed so far and shows this
+            await emit("status", "Searching the internet...")
+
+            # Pipeline: Search and fetch content
+            pages = await search_and_fetch(search_query, limit=5, max_chars=CONFIG["PAGE_MAX_CHARS"])
+            web_budget = (CONFIG["CONTEXT_TOKENS"] - MAX_COMPLETION_TOKENS - 2 * PROMPT_OVERHEAD_TOKENS
+                          - count_tokens(system_text) - count_tokens(new_question))
+            web_contents = await select_web_passages(pages, f"{new_question} {search_query}", max(0, web_budget))
+
+            # Construct final prompt with search results
+            final_prompt_lines = [
+                f"System: {system_text}",
+                "The following is data retrieved from the internet:\n" + "\n".join(web_contents),
+                f"The user prompt was: {new_question}",
+                "Answer the query using only the data above, without performing additional searches.",
+                "Assistant:"
+            ]
+            final_prompt = "\n".join(final_prompt_lines)
+            debug_print("Final prompt with search data:\n", final_prompt)
+            prompt_tokens += count_tokens(final_prompt)
+            completion = []
+
+            # Stream final response token-by-token
+            async with LLM_SCHEDULER.slot(user_id, notify):
+                async with aclosing(stream_ollama_response(final_prompt, CONFIG["MODEL_NAME"])) as final_tokens:
+                    async for final_token in final_tokens:
+                        completion.append(final_token)
+                        await emit("token", final_token)
+    except QueueFull:
+        debug_print("Queue full, request refused:", user_id)
+        await emit("error", "[Error] MULTIVAC is busy. Please try again in a minute.")
+        return
+    debug_print(f"Tokens: prompt ~{prompt_tokens}, completion ~{count_tokens(''.join(completion))}")
+
+async def serve_multiplexed(websocket, message):
+    """
+    Persistent connection from the telnet server carrying many requests:
+
+      -> {"type": "request", "request_id": ..., <payload>}
+      -> {"type": "cancel", "request_id": ...}
+      <- {"type": "token"|"status"|"queue"|"error", "request_id": ..., "text": ...}
+      <- {"type": "end", "request_id": ...}
+
+    A "status" frame (e.g. before a web search) ends the text streamed so
+    far; the answer starts after it.
+
+    Every request ends with an "end" frame unless it was cancelled.
+    """
+    tasks = {}
+
+    async def run(data):
+        request_id = data.get("request_id")
+
+        async def send(kind, text=""):
+            await websocket.send(json.dumps({"type": kind, "request_id": request_id, "text": text}))
+
+        emit, batcher = batched_emit(send, data)
         try:
-            data = json.loads(line)
-            debug_print("Parsed chunk:", data)
-            if "choices" in data and data["choices"]:
-                content = data["choices"][0]["delta"].get("content", "")
-                if content:
-                    debug_print("Yielding token:", repr(content))
-                    yield content
-                    await asyncio.sleep(0.05)
-        except json.JSONDecodeError as je:
-            debug_print("JSON error:", je, "Line:", line)
-            yield f"[Unparseable chunk] {line}"
-    await process.wait()
-    debug_print("Curl finished with code:", process.returncode)
+            try:
+                await answer_question(data, emit)
+            except (asyncio.CancelledError, websockets.exceptions.ConnectionClosed):
+                raise
+            except Exception as e:
+                debug_print("Error:", type(e).__name__, str(e))
+                await emit("error", f"[AI Error] {type(e).__name__}: {e}")
+            await emit("end")
+        except asyncio.CancelledError:
+            debug_print("Request cancelled:", request_id)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            batcher.close()
+            tasks.pop(request_id, None)
+
+    try:
+        while True:
+            data = json.loads(message)
+            request_id = data.get("request_id")
+            if data.get("type") == "request":
+                tasks[request_id] = asyncio.ensure_future(run(data))
+            elif data.get("type") == "cancel" and request_id in tasks:
+                tasks[request_id].cancel()
+            message = await websocket.recv()
+    finally:
+        for task in list(tasks.values()):
+            task.cancel()
 
 async def handle_ai_connection(websocket):
     try:
         msg = await websocket.recv()
         debug_print("Received:", msg)
         data = json.loads(msg)
-        if data.get("auth_token", "") != CONFIG["AUTH_TOKEN"]:
-            debug_print("Auth failed. Received:", data.get("auth_token"), "Expected:", CONFIG["AUTH_TOKEN"])
-            await websocket.send("[Error] Invalid or missing auth token.")
+        if "type" in data:
+            await serve_multiplexed(websocket, msg)
             return
-        debug_print("Auth successful")
-        
-        conversation = data.get("conversation", [])
-        context = data.get("context", "")
-        new_question = data.get("new_question", "")
-        
-        system_text = (
-            "Your name is MULTIVAC, a (non-fictional) universal knowledge tool, for vintage machine collectors connecting via telnet, acting as a web browser replacement (since old machines have no web browsers). "
-            "Tone: concise, technical, professional, 80s corporate mainframe. "
-            "ONLY answer in natural English language. NEVER repeat the system message, user prompt, NEVER fabricate conversations or repeat yourself. "
-            "Primary goal: Answer from provided context (e.g., Wikipedia article) if available and sufficient. "
-            "If context is insufficient or absent, or for real-time/factual queries outside the context, immediately trigger a web search with <search>query</search>. "
-            "When context is a Wikipedia article, answer strictly from that data unless it lacks the required info. "
-            "Provide succinct, accurate answers using only provided context or search results. No speculation or chit-chat.\n" +
-            CONFIG["SYSTEM_TEXT"]
-        )
-        
-        prompt_lines = [f"System: {system_text}"]
-        if context:
-            prompt_lines.append(f"Article Context:\n{context}")
-        # Correctly handle conversation as a list
-        for msg_item in conversation:
-            if isinstance(msg_item, dict):  # Ensure it's a dict
-                role = msg_item.get("speaker", "User")
-                text = msg_item.get("text", "")
-                prompt_lines.append(f"{role}: {text}")
-        prompt_lines.append(f"User: {new_question}")
-        prompt_lines.append("Assistant:")
-        full_prompt = "\n".join(prompt_lines)
-        debug_print("Initial prompt:\n", full_prompt)
-        
-        response_buffer = ""
-        async for token in stream_ollama_response(full_prompt, CONFIG["MODEL_NAME"]):
-            response_buffer += token
-            if "<search>" in response_buffer:
-                search_match = re.search(r'<search>(.*?)</search>', response_buffer)
-                if search_match:
-                    search_query = search_match.group(1)
-                    debug_print("Search triggered:", search_query)
-                    await websocket.send("\033cMULTIVAC: Searching the internet...")
-                    
-                    # Pipeline: Search and fetch content
-                    search_result = do_google_search(search_query)
-                    urls = process_search_results(search_result, limit=5)
-                    web_contents = []
-                    for url in urls:
-                        content = fetch_web_content(url, max_chars=2000)
-                        web_contents.append(f"Content from {url}:\n{content}\n")
-                    
-                    # Construct final prompt with search results
-                    final_prompt_lines = [
-                        f"System: {system_text}",
-                        "The following is data retrieved from the internet:\n" + "\n".join(web_contents),
-                        f"The user prompt was: {new_question}",
-                        "Answer the query using only the data above, without performing additional searches.",
-                        "Assistant:"
-                    ]
-                    final_prompt = "\n".join(final_prompt_lines)
-                    debug_print("Final prompt with search data:\n", final_prompt)
-                    
-                    # Stream final response token-by-token
-                    async for final_token in stream_ollama_response(final_prompt, CONFIG["MODEL_NAME"]):
-                        await websocket.send(final_token)
-                    break
-            else:
-                await websocket.send(token)
-                
+
+        # Legacy client: one request per connection, answered as raw text.
+        # It knows no status frames, so the text before one is cleared
+        # with a screen reset.
+        async def send(kind, text):
+            if kind == "queue":
+                return
+            if kind == "status":
+                text = "\033cMULTIVAC: " + text
+            await websocket.send(text)
+
+        emit, batcher = batched_emit(send, data)
+        # A client that hangs up while queued is dropped from the queue
+        answer = asyncio.ensure_future(answer_question(data, emit))
+        closed = asyncio.ensure_future(websocket.wait_closed())
+        try:
+            await asyncio.wait([answer, closed], return_when=asyncio.FIRST_COMPLETED)
+            if not answer.done():
+                answer.cancel()
+                debug_print("Connection closed by client")
+                return
+            answer.result()
+        finally:
+            closed.cancel()
+            # also ahead of an error message sent below
+            await batcher.flush()
+
     except websockets.exceptions.ConnectionClosed:
         debug_print("Connection closed by client")
     except Exception as e:
@@ -256,9 +1377,25 @@ def create_self_signed_cert(certfile="server.crt", keyfile="server.key"):
     debug_print("Cert generated:", certfile, keyfile)
 
 async def main():
-    global CONFIG
+    global CONFIG, HTTP_SESSION, WEB_CACHE, LLM_SCHEDULER, LLM_BATCHER
     CONFIG = load_config()
     debug_print("Config:", CONFIG)
+    LLM_SCHEDULER = LLMScheduler(CONFIG["LLM_SLOTS"], CONFIG["LLM_QUEUE"])
+    if CONFIG["BATCH_WINDOW_MS"] > 0 and CONFIG["BATCH_COMPLETIONS_URI"]:
+        LLM_BATCHER = PromptBatcher(
+            CONFIG["BATCH_WINDOW_MS"] / 1000.0, CONFIG["BATCH_MAX"], CONFIG["BATCH_COMPLETIONS_URI"]
+        )
+    WEB_CACHE = WebCache(CONFIG["WEB_CACHE_ENTRIES"], CONFIG["WEB_CACHE_BYTES"], CONFIG["WEB_CACHE_PATH"] or None)
+    # No total timeout: answers stream for as long as the model keeps
+    # producing, but a stalled read or connect fails.
+    HTTP_SESSION = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=CONFIG["HTTP_CONNECTIONS"], keepalive_timeout=60),
+        timeout=aiohttp.ClientTimeout(
+            total=None,
+            sock_connect=CONFIG["LLM_CONNECT_TIMEOUT"],
+            sock_read=CONFIG["LLM_READ_TIMEOUT"]
+        )
+    )
     port = CONFIG["PORT"]
     debug_print(f"Starting server on wss://0.0.0.0:{port}/ai")
     certfile, keyfile = "server.crt", "server.key"
@@ -0,0 +1,41 @@
+"""Running the AI server's web code against a local stub HTTP server."""
+import contextlib
+
+import aiohttp
+from aiohttp import web
+
+import ollama_ai_server as ai
+
+
+def configure(**overrides):
+    ai.CONFIG = ai.load_config("/nonexistent")
+    ai.CONFIG.update({"DEBUG": False, "EMBEDDING_MODEL": ""}, **overrides)
+    ai.WEB_CACHE = ai.WebCache(100, 1 << 20)
+
+
+@contextlib.asynccontextmanager
+async def stub_server(routes):
+    """
+    Serve `routes` ({path: handler}, or {"POST path": handler}) on a free
+    port; yields the base URL with HTTP_SESSION open.
+    """
+    app = web.Application()
+    for route, handler in routes.items():
+        method, _, path = route.rpartition(" ")
+        app.router.add_route(method or "GET", path, handler)
+    # a client that gave up on a slow page cancels its handler
+    runner = web.AppRunner(app, handler_cancellation=True)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    ai.HTTP_SESSION = aiohttp.ClientSession()
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        await ai.HTTP_SESSION.close()
+        await runner.cleanup()
+
+
+def html_page(text):
+    return f"<html><body><nav>menu</nav><p>{text}</p><script>x()</script></body></html>"
@@ -0,0 +1,72 @@
+"""fetch_web_content reads pages as a stream and stops early."""
+import asyncio
+
+import pytest
+from aiohttp import web
+
+import ollama_ai_server as ai
+from helpers import configure, html_page, stub_server
+
+CHUNK = 16384
+CHUNKS = 200
+
+
+def streamed_page(written):
+    """A 3 MB page sent in 16 KB chunks; the first chunk alone has plenty of text."""
+    async def handler(request):
+        response = web.StreamResponse(headers={"Content-Type": "text/html; charset=utf-8"})
+        await response.prepare(request)
+        first = html_page("word " * 2000).encode()
+        try:
+            for i in range(CHUNKS):
+                body = first if i == 0 else b"<p>" + b"x" * (CHUNK - 7) + b"</p>"
+                await response.write(body)
+                written.append(len(body))
+                await asyncio.sleep(0.005)
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        return response
+    return handler
+
+
+def fetch(routes, path, max_chars=200, **config):
+    configure(**config)
+
+    async def scenario():
+        async with stub_server(routes) as base:
+            return await ai.fetch_web_content(base + path, max_chars=max_chars)
+    return asyncio.run(scenario())
+
+
+def test_stops_reading_once_enough_text():
+    written = []
+    text = fetch({"/big": streamed_page(written)}, "/big", max_chars=200)
+    assert text.startswith("word word") and len(text) <= 203
+    # the server got to send a few chunks at most before the client hung up
+    assert len(written) < 5
+
+
+def test_size_cap_stops_reading():
+    written = []
+    fetch({"/big": streamed_page(written)}, "/big", max_chars=10 ** 6, FETCH_MAX_BYTES=5 * CHUNK)
+    assert len(written) < 20
+
+
+def test_skips_scripts_and_page_chrome():
+    async def handler(request):
+        return web.Response(text=html_page("Body text."), content_type="text/html")
+    assert fetch({"/p": handler}, "/p") == "Body text."
+
+
+def test_rejects_non_html():
+    async def pdf(request):
+        return web.Response(body=b"%PDF-1.4 " * 1000, content_type="application/pdf")
+    with pytest.raises(ValueError, match="not an HTML page"):
+        fetch({"/doc.pdf": pdf}, "/doc.pdf")
+
+
+def test_rejects_declared_oversize_page():
+    async def huge(request):
+        return web.Response(body=b"<p>x</p>" * 1000, content_type="text/html")
+    with pytest.raises(ValueError, match="too large"):
+        fetch({"/huge": huge}, "/huge", FETCH_MAX_BYTES=1000)
@@ -0,0 +1,77 @@
+"""PromptBatcher against a stub /v1/completions endpoint that records each request."""
+import asyncio
+import json
+
+from aiohttp import web
+
+import ollama_ai_server as ai
+from helpers import configure, stub_server
+
+
+def completions(received):
+    async def handler(request):
+        body = await request.json()
+        received.append(body["prompt"])
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for step in range(3):
+            for index, prompt in enumerate(body["prompt"]):
+                chunk = {"choices": [{"index": index, "text": f"{prompt}:{step} "}]}
+                await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await asyncio.sleep(0.01)
+        await response.write(b"data: [DONE]\n\n")
+        return response
+    return handler
+
+
+async def collect(prompt, limit=None):
+    tokens = []
+    async for token in ai.stream_ollama_response(prompt, "model"):
+        tokens.append(token)
+        if limit is not None and len(tokens) >= limit:
+            break
+    return "".join(tokens)
+
+
+def run_batched(scenario, window=0.05, max_size=8):
+    configure()
+    received = []
+
+    async def run():
+        async with stub_server({"POST /v1/completions": completions(received)}) as base:
+            ai.LLM_BATCHER = ai.PromptBatcher(window, max_size, base + "/v1/completions")
+            try:
+                return await scenario()
+            finally:
+                ai.LLM_BATCHER = None
+    return asyncio.run(run()), received
+
+
+def test_prompts_within_window_share_one_request():
+    async def scenario():
+        return await asyncio.gather(collect("a"), collect("b"), collect("c"))
+
+    answers, received = run_batched(scenario)
+    assert received == [["a", "b", "c"]]
+    assert answers == ["a:0 a:1 a:2 ", "b:0 b:1 b:2 ", "c:0 c:1 c:2 "]
+
+
+def test_full_batch_goes_without_waiting_for_the_window():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(collect("a"), collect("b"))
+        return loop.time() - start
+
+    elapsed, received = run_batched(scenario, window=5.0, max_size=2)
+    assert received == [["a", "b"]]
+    assert elapsed < 1.0
+
+
+def test_caller_that_stops_reading_leaves_the_others_their_answer():
+    async def scenario():
+        return await asyncio.gather(collect("a", limit=1), collect("b"))
+
+    answers, received = run_batched(scenario)
+    assert received == [["a", "b"]]
+    assert answers == ["a:0 ", "b:0 b:1 b:2 "]
@@ -0,0 +1,57 @@
+"""Passage ranking: embeddings kept compact, and a lexical fallback for any language."""
+import asyncio
+import sys
+
+from aiohttp import web
+
+import ollama_ai_server as ai
+from helpers import configure, stub_server
+
+DIMENSIONS = 768
+
+
+def test_lexical_fallback_ranks_non_english_text():
+    chunks = [
+        "Die Stadt liegt am Fluss und hat einen Hafen.",
+        "Der Kölner Dom ist eine gotische Kathedrale.",
+        "Москва — столица России.",
+    ]
+    assert ai.lexical_scores("Wie hoch ist der Kölner Dom?", chunks)[1] > 0
+    scores = ai.lexical_scores("столица", chunks)
+    assert scores.index(max(scores)) == 2 and scores[2] > 0
+
+
+def test_embeddings_stored_as_float32():
+    async def embed(request):
+        body = await request.json()
+        return web.json_response({"embeddings": [[3.0, 4.0] + [0.0] * (DIMENSIONS - 2)
+                                                 for _ in body["input"]]})
+
+    configure(EMBEDDING_MODEL="nomic-embed-text")
+
+    async def scenario():
+        async with stub_server({"POST /api/embed": embed}) as base:
+            ai.CONFIG["OLLAMA_URI"] = base + "/api"
+            return await ai.embed_texts(["a", "b"])
+
+    vectors = asyncio.run(scenario())
+    assert len(vectors) == 2
+    vector = vectors[0]
+    assert vector.typecode == "f" and len(vector) == DIMENSIONS
+    assert abs(vector[0] - 0.6) < 1e-6 and abs(vector[1] - 0.8) < 1e-6
+    # about 4 bytes per dimension, not a list of boxed floats
+    assert sys.getsizeof(vector) < DIMENSIONS * 5
+
+
+def test_ranking_with_vectors():
+    index = ai.PassageIndex([(0, "x"), (10, "y")], [ai.array("f", [1.0, 0.0]), ai.array("f", [0.0, 1.0])])
+
+    async def query_vector(texts):
+        return [ai.array("f", [0.0, 1.0])]
+
+    ai.embed_texts, original = query_vector, ai.embed_texts
+    try:
+        configure()
+        assert asyncio.run(index.ranked("y?")) == [1, 0]
+    finally:
+        ai.embed_texts = original
@@ -0,0 +1,119 @@
+"""search_and_fetch against a local stub HTTP server with slow and failing pages."""
+import asyncio
+import time
+
+from aiohttp import web
+
+import ollama_ai_server as ai
+from helpers import configure, html_page, stub_server
+
+
+def page(text, delay=0.0):
+    async def handler(request):
+        await asyncio.sleep(delay)
+        return web.Response(text=html_page(text), content_type="text/html")
+    return handler
+
+
+async def failing(request):
+    return web.Response(status=500, text="boom")
+
+
+async def not_html(request):
+    return web.Response(body=b"%PDF-1.4", content_type="application/pdf")
+
+
+def run_search(monkeypatch, routes, ranked_paths, **config):
+    configure(**config)
+
+    async def scenario():
+        async with stub_server(routes) as base:
+            async def fake_search(query):
+                return "\n".join(f"{i}. {base}{path}" for i, path in enumerate(ranked_paths, 1))
+            monkeypatch.setattr(ai, "do_google_search", fake_search)
+            start = time.perf_counter()
+            pages = await ai.search_and_fetch("query", limit=5, max_chars=200)
+            return [url[len(base):] for url, _ in pages], [text for _, text in pages], time.perf_counter() - start
+
+    return asyncio.run(scenario())
+
+
+def test_results_in_rank_order_not_arrival_order(monkeypatch):
+    routes = {"/a": page("first", delay=0.3), "/b": page("second", delay=0.0),
+              "/fail": failing, "/pdf": not_html, "/c": page("third", delay=0.1)}
+    paths, texts, _ = run_search(monkeypatch, routes, ["/a", "/b", "/fail", "/pdf", "/c"],
+                                 SEARCH_MIN_PAGES=3, SEARCH_DEADLINE=5.0)
+    assert paths == ["/a", "/b", "/c"]
+    assert texts == ["first", "second", "third"]
+
+
+def test_stops_once_enough_pages_arrived(monkeypatch):
+    routes = {"/a": page("a"), "/slow": page("slow", delay=5.0), "/b": page("b"), "/c": page("c", delay=0.1)}
+    paths, _, elapsed = run_search(monkeypatch, routes, ["/a", "/slow", "/b", "/c"],
+                                   SEARCH_MIN_PAGES=3, SEARCH_DEADLINE=10.0, FETCH_TIMEOUT=10.0)
+    assert paths == ["/a", "/b", "/c"]
+    assert elapsed < 1.0
+
+
+def test_deadline_abandons_slow_pages(monkeypatch):
+    routes = {"/a": page("a"), "/slow1": page("s1", delay=5.0), "/slow2": page("s2", delay=5.0)}
+    paths, _, elapsed = run_search(monkeypatch, routes, ["/slow1", "/a", "/slow2"],
+                                   SEARCH_MIN_PAGES=3, SEARCH_DEADLINE=0.5, FETCH_TIMEOUT=10.0)
+    assert paths == ["/a"]
+    assert 0.4 < elapsed < 1.5
+
+
+def test_fetch_timeout_drops_a_hanging_page(monkeypatch):
+    routes = {"/a": page("a"), "/hang": page("h", delay=5.0)}
+    paths, _, elapsed = run_search(monkeypatch, routes, ["/hang", "/a"],
+                                   SEARCH_MIN_PAGES=2, SEARCH_DEADLINE=10.0, FETCH_TIMEOUT=0.3)
+    assert paths == ["/a"]
+    assert elapsed < 1.5
+
+
+def test_abandoned_pages_stop_downloading(monkeypatch):
+    """Leftover fetches are cancelled, not left running behind the cache's shield."""
+    configure(SEARCH_MIN_PAGES=1, SEARCH_DEADLINE=10.0, FETCH_TIMEOUT=10.0)
+    served = {"cancelled": 0}
+
+    async def slow(request):
+        try:
+            await asyncio.sleep(5.0)
+        except asyncio.CancelledError:
+            served["cancelled"] += 1
+            raise
+        return web.Response(text=html_page("slow"), content_type="text/html")
+
+    async def scenario():
+        async with stub_server({"/a": page("a", delay=0.1), "/slow1": slow, "/slow2": slow}) as base:
+            async def fake_search(query):
+                return "\n".join(f"{base}{path}" for path in ["/slow1", "/a", "/slow2"])
+            monkeypatch.setattr(ai, "do_google_search", fake_search)
+            pages = await ai.search_and_fetch("query", limit=5, max_chars=200)
+            await asyncio.sleep(0.2)
+            return pages, len(ai.WEB_CACHE._inflight)
+
+    pages, inflight = asyncio.run(scenario())
+    assert [text for _, text in pages] == ["a"]
+    assert inflight == 0
+    assert served["cancelled"] == 2
+
+
+def test_fetch_shared_with_a_waiting_caller_keeps_running(monkeypatch):
+    configure()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return "page"
+
+    async def scenario():
+        first = asyncio.ensure_future(ai.WEB_CACHE.get_or_fetch("k", fetch, 60))
+        second = asyncio.ensure_future(ai.WEB_CACHE.get_or_fetch("k", fetch, 60))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        return await second, ai.WEB_CACHE.get("k")
+
+    assert asyncio.run(scenario()) == ("page", "page")
+    assert len(calls) == 1
@@ -0,0 +1,46 @@
+"""
+Article-sized inputs for the benchmarks: a synthetic article with a given
+number of links, or a real page fetched with the wikipedia package.
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+
+
+def synthetic_article(links=3000, paragraphs=600, words_per_paragraph=80, seed=1):
+    """Return (content, links): paragraphs of random words, links drawn from the same words."""
+    rnd = random.Random(seed)
+    vocab = ["".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(3, 9)))
+             for _ in range(3000)]
+    link_list = sorted({" ".join(rnd.choice(vocab) for _ in range(rnd.randint(1, 3))).title()
+                        for _ in range(links)})
+    # single newlines between paragraphs, like server._wiki_page_blocking leaves them
+    content = "\n".join(" ".join(rnd.choice(vocab) for _ in range(words_per_paragraph))
+                          for _ in range(paragraphs))
+    return content, link_list
+
+
+def real_article(title, lang="en"):
+    """Return (content, links) of a Wikipedia page, processed like the telnet server does."""
+    import wikipedia
+    wikipedia.set_lang(lang)
+    article = server._wiki_page_blocking(title)
+    if isinstance(article, Exception):
+        raise article
+    return article.content, article.links
+
+
+def load(args):
+    if args.title:
+        return [(title, *real_article(title, args.lang)) for title in args.title]
+    return [(f"synthetic ({links} links)", *synthetic_article(links=links)) for links in (300, 3000)]
+
+
+def add_arguments(parser):
+    parser.add_argument("--title", action="append",
+                        help="benchmark a real Wikipedia page (repeatable; needs network)")
+    parser.add_argument("--lang", default="en")
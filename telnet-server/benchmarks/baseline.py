@@ -0,0 +1,87 @@
+"""
+The article wrapping code as it was before the link matcher and the
+single-pass placeholder re-injection, kept only to benchmark against.
+"""
+import re
+import textwrap
+
+
+def linkify_preserving_case(content, links):
+    """
+    Replaces each link in the text with [OriginalCase] ignoring case,
+    but preserving the exact substring found in `content`.
+    Then we insert placeholders which we re-inject later.
+    """
+    valid_links = [l for l in links if len(l) > 1]
+    if not valid_links:
+        return content, {}
+
+    pattern = r'(' + r'|'.join(re.escape(lnk) for lnk in valid_links for lnk in [lnk]) + r')'
+    placeholders = {}
+    idx = 0
+
+    def replacement(m):
+        nonlocal idx
+        matched = m.group(0)  # exact substring in content
+        placeholder = f"{{PLCH{idx}}}"
+        placeholders[placeholder] = f"[{matched}]"
+        idx += 1
+        return placeholder
+
+    # ignore case but keep the matched substring
+    new_content = re.sub(pattern, replacement, content, flags=re.IGNORECASE)
+    return new_content, placeholders
+
+
+def final_wrap_after_injection(lines, line_width):
+    """
+    Because the re-injected bracket text can lengthen lines,
+    we do a second pass to ensure they never exceed line_width.
+    """
+    final_text = "\n".join(lines)
+    wrapped2 = []
+    paras = final_text.split("\n\n")
+    for p in paras:
+        p = p.strip()
+        if p:
+            wrapped_seg = textwrap.fill(p, width=line_width).splitlines()
+            wrapped2.extend(wrapped_seg)
+            wrapped2.append("")
+    if wrapped2 and wrapped2[-1] == "":
+        wrapped2.pop()
+    return wrapped2
+
+
+def wrap_content(content, line_width, links):
+    r"""
+    1) Convert link occurrences to placeholders (preserving case).
+    2) remove leftover [\d+] references
+    3) textwrap
+    4) re-inject placeholders with bracket text
+    5) do a second textwrap pass to ensure lines never exceed line_width
+    """
+    # Step 1: placeholders
+    content, placeholders = linkify_preserving_case(content, links)
+    # Step 2: remove e.g. [1], [2], etc.
+    content = re.sub(r'\[\d+\]', '', content)
+
+    # Step 3: initial wrap
+    paras = content.split("\n\n") if "\n\n" in content else content.split("\n")
+    lines = []
+    for para in paras:
+        para = para.strip()
+        if para:
+            wrapped = textwrap.fill(para, width=line_width).splitlines()
+            lines.extend(wrapped)
+            lines.append("")
+    if lines and lines[-1] == "":
+        lines.pop()
+
+    # Step 4: re-inject bracket text
+    for i in range(len(lines)):
+        for placeholder, bracket_text in placeholders.items():
+            lines[i] = lines[i].replace(placeholder, bracket_text)
+
+    # Step 5: final re-wrap
+    lines = final_wrap_after_injection(lines, line_width)
+    return lines
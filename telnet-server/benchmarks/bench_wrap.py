@@ -0,0 +1,40 @@
+"""
+Wrapping whole articles: the old wrap_content (placeholder str.replace per
+line and per link, then a second full re-wrap) against the current one
+(same-width placeholders re-injected in a single regex pass).
+
+    python benchmarks/bench_wrap.py [--width 78] [--title "World War II" ...]
+"""
+import argparse
+import time
+
+import articles
+import baseline
+import server
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    articles.add_arguments(parser)
+    parser.add_argument("--width", type=int, default=78)
+    args = parser.parse_args()
+    for name, content, links in articles.load(args):
+        print(f"{name}: {len(content) // 1024} KB, {len(links)} links, width {args.width}")
+        old, old_time = timed(baseline.wrap_content, content, args.width, links)
+        print(f"  old wrap_content      {old_time * 1000:8.1f} ms  {len(old)} lines")
+        matcher, build_time = timed(server.LinkMatcher, links)
+        new, new_time = timed(server.wrap_content, content, args.width, matcher)
+        print(f"  new wrap_content      {new_time * 1000:8.1f} ms  {len(new)} lines "
+              f"(+{build_time * 1000:.1f} ms matcher build, once per article)")
+        print(f"  longest line {max(map(len, new))}, "
+              f"links marked: old {sum(l.count('[') for l in old)}, new {sum(l.count('[') for l in new)}")
+
+
+if __name__ == "__main__":
+    main()
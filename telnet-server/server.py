@@ -3,6 +3,7 @@ import re
 import sys
 import telnetlib3
 import wikipedia
+import requests
 import textwrap
 import os
 import json
@@ -10,6 +11,14 @@ import uuid
 import ssl
 import websockets
 import configparser
+import functools
+import bisect
+import socket
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # ------------- REVISED CODE STARTS HERE ----------------
 
@@ -39,6 +48,27 @@ def load_config(path=CONFIG_PATH):
     ai_activated_str = config.get("general", "ai_activated", fallback="true").lower()
     ai_activated = (ai_activated_str == "true" or ai_activated_str == "1")
 
+    # Total output rate shared by all sessions (0 = unlimited)
+    uplink_kbps = config.getfloat("general", "uplink_kbps", fallback=0)
+
+    # Wikipedia lookups run in a bounded thread pool, never on the event loop
+    wiki_workers = config.getint("general", "wiki_workers", fallback=4)
+    wiki_timeout = config.getfloat("general", "wiki_timeout", fallback=20.0)
+
+    # [cache] process-wide in-memory article cache
+    cache_max_entries = config.getint("cache", "memory_max_entries", fallback=200)
+    cache_max_mb = config.getfloat("cache", "memory_max_mb", fallback=32)
+    cache_ttl = config.getint("cache", "ttl", fallback=3600)
+    cache_negative_ttl = config.getint("cache", "negative_ttl", fallback=300)
+    disk_str = config.get("cache", "disk_enabled", fallback="false").lower()
+    disk_enabled = (disk_str == "true" or disk_str == "1")
+    disk_path = config.get("cache", "disk_path", fallback="article_cache.sqlite3")
+    disk_max_mb = config.getfloat("cache", "disk_max_mb", fallback=256)
+    disk_ttl = config.getint("cache", "disk_ttl", fallback=86400)
+
+    # Persistent websocket connections to the AI server, shared by all sessions
+    ai_connections = config.getint("general", "ai_connections", fallback=2)
+
     # [ollama]
     model = config.get("ollama", "model", fallback="smollm2:360m")
 
@@ -49,7 +79,19 @@ def load_config(path=CONFIG_PATH):
         "AI_URI": ai_websocket_uri,
         "WELCOME_MSG": welcome_msg,
         "MODEL": model,
-        "AI_ACTIVATED": ai_activated
+        "AI_ACTIVATED": ai_activated,
+        "AI_CONNECTIONS": max(1, ai_connections),
+        "UPLINK_BYTES_PER_SEC": uplink_kbps * 1000 / 8,
+        "WIKI_WORKERS": max(1, wiki_workers),
+        "WIKI_TIMEOUT": wiki_timeout,
+        "CACHE_MAX_ENTRIES": max(1, cache_max_entries),
+        "CACHE_MAX_BYTES": int(cache_max_mb * 1024 * 1024),
+        "CACHE_TTL": cache_ttl,
+        "CACHE_NEGATIVE_TTL": cache_negative_ttl,
+        "DISK_CACHE": disk_enabled,
+        "DISK_CACHE_PATH": disk_path,
+        "DISK_CACHE_MAX_BYTES": int(disk_max_mb * 1024 * 1024),
+        "DISK_CACHE_TTL": disk_ttl
     }
 
 def telnet_debug_print(conf, *args, **kwargs):
@@ -66,7 +108,9 @@ def get_welcome_logo():
     return CONF["WELCOME_MSG"]
 
 def extract_toc_and_lines(content):
-    lines = content.splitlines()
+    # split on "\n" exactly like wrap_content does, so TOC line indexes and
+    # wrap_content_indexed's paragraph offsets agree
+    lines = content.split("\n")
     toc = []
     for idx, line in enumerate(lines):
         m = re.match(r'^(={2,})([^=].*?)(={2,})\s*$', line.strip())
@@ -86,83 +130,566 @@ def remove_wiki_markup(text):
         text
     )
 
-def linkify_preserving_case(content, links):
+def fold_case(text):
+    """
+    Lower-case `text` without changing its length, so that offsets found in
+    the folded string are valid in the original one.
+    """
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+class LinkMatcher:
     """
-    Replaces each link in the text with [OriginalCase] ignoring case,
-    but preserving the exact substring found in `content`.
-    Then we insert placeholders which we re-inject later.
+    Case-insensitive multi-pattern matcher over an article's links, built as
+    a character trie. finditer() scans the text once and yields
+    non-overlapping (start, end, link) matches, leftmost-longest first.
+    Links of a single character are ignored.
+
+    Built once per WikiArticle, so it lives exactly as long as the article
+    in ARTICLE_CACHE; `size` (bytes held by the trie) counts against the
+    cache's memory cap. To keep that small, a branch leading to a single
+    link is stored as a (rest of the folded link, link) leaf instead of one
+    dict per character.
+    """
+    _END = ""  # trie key marking the end of a link (never a real character)
+
+    def __init__(self, links):
+        self.root = {}
+        for link in links:
+            if len(link) < 2:
+                continue
+            node = self.root
+            for ch in fold_case(link):
+                node = node.setdefault(ch, {})
+            node.setdefault(self._END, link)
+        self.size = self._compress(self.root)
+
+    def _compress(self, node):
+        """Turn single-link branches below `node` into leaves; return the bytes kept."""
+        size = sys.getsizeof(node)
+        for ch, child in list(node.items()):
+            if ch == self._END:
+                continue
+            rest, tail = [], child
+            while len(tail) == 1 and self._END not in tail:
+                key, tail = next(iter(tail.items()))
+                rest.append(key)
+            if len(tail) == 1:
+                leaf = ("".join(rest), tail[self._END])
+                node[ch] = leaf
+                size += sys.getsizeof(leaf) + sys.getsizeof(leaf[0])
+            else:
+                size += self._compress(child)
+        return size
+
+    def finditer(self, text):
+        folded = fold_case(text)
+        root, end_key = self.root, self._END
+        n = len(folded)
+        i = 0
+        while i < n:
+            node = root.get(folded[i])
+            j = i + 1
+            best_end, best_link = -1, None
+            while node is not None:
+                if type(node) is tuple:
+                    rest, link = node
+                    if folded.startswith(rest, j):
+                        best_end, best_link = j + len(rest), link
+                    break
+                if end_key in node:
+                    best_end, best_link = j, node[end_key]
+                if j >= n:
+                    break
+                node = node.get(folded[j])
+                j += 1
+            if best_end < 0:
+                i += 1
+                continue
+            yield i, best_end, best_link
+            i = best_end
+
+# A link is replaced by a placeholder of exactly the same width as its
+# "[text]" form: PLACEHOLDER_START followed by PLACEHOLDER_FILL characters.
+# textwrap then already wraps at the final line widths, and re-injection is a
+# single regex pass. Private-use characters never occur in article text.
+PLACEHOLDER_START = "\ue000"
+PLACEHOLDER_FILL = "\ue001"
+PLACEHOLDER_RE = re.compile(PLACEHOLDER_START + PLACEHOLDER_FILL + "*|" + PLACEHOLDER_FILL + "+")
+
+def linkify_preserving_case(content, link_matcher):
     """
-    valid_links = [l for l in links if len(l) > 1]
-    if not valid_links:
-        return content, {}
-
-    pattern = r'(' + r'|'.join(re.escape(lnk) for lnk in valid_links for lnk in [lnk]) + r')'
-    placeholders = {}
-    idx = 0
-
-    def replacement(m):
-        nonlocal idx
-        matched = m.group(0)  # exact substring in content
-        placeholder = f"{{PLCH{idx}}}"
-        placeholders[placeholder] = f"[{matched}]"
-        idx += 1
-        return placeholder
-
-    # ignore case but keep the matched substring
-    new_content = re.sub(pattern, replacement, content, flags=re.IGNORECASE)
-    return new_content, placeholders
-
-def final_wrap_after_injection(lines, line_width):
+    Replaces each link in the text with a placeholder for [OriginalCase],
+    ignoring case but preserving the exact substring found in `content`.
+    Returns the new content and (bracket text, link) pairs in order of
+    appearance, which we re-inject later.
+    Overlapping candidates resolve leftmost-longest ("Morse code" beats "Morse").
     """
-    Because the re-injected bracket text can lengthen lines,
-    we do a second pass to ensure they never exceed line_width.
+    if link_matcher is None or not link_matcher.root:
+        return content, []
+
+    brackets = []
+    out = []
+    pos = 0
+    for start, end, link in link_matcher.finditer(content):
+        # exact substring in content
+        bracket_text = f"[{content[start:end]}]"
+        brackets.append((bracket_text, link))
+        out.append(content[pos:start])
+        out.append(PLACEHOLDER_START + PLACEHOLDER_FILL * (len(bracket_text) - 1))
+        pos = end
+    out.append(content[pos:])
+    return "".join(out), brackets
+
+def wrap_content(content, line_width, link_matcher):
+    return wrap_content_indexed(content, line_width, link_matcher)[0]
+
+def wrap_content_indexed(content, line_width, link_matcher):
     """
-    final_text = "\n".join(lines)
-    wrapped2 = []
-    paras = final_text.split("\n\n")
-    for p in paras:
-        p = p.strip()
-        if p:
-            wrapped_seg = textwrap.fill(p, width=line_width).splitlines()
-            wrapped2.extend(wrapped_seg)
-            wrapped2.append("")
-    if wrapped2 and wrapped2[-1] == "":
-        wrapped2.pop()
-    return wrapped2
-
-def wrap_content(content, line_width, links):
+    Wrap a whole article at once; see iter_wrapped_paragraphs.
+
+    Returns (lines, link_positions, para_starts). link_positions is sorted;
+    para_starts lists (raw_line_idx, wrapped_line_idx) for each paragraph,
+    where raw_line_idx indexes content.split("\n").
     """
-    1) Convert link occurrences to placeholders (preserving case).
-    2) remove leftover [\d+] references
+    lines = []
+    link_positions = []
+    para_starts = []
+    for raw_idx, para_lines, para_links, _ in iter_wrapped_paragraphs(content, line_width, link_matcher):
+        if lines:
+            lines.append("")
+        base = len(lines)
+        para_starts.append((raw_idx, base))
+        lines.extend(para_lines)
+        link_positions.extend((base + i, start, end, link) for i, start, end, link in para_links)
+    return lines, link_positions, para_starts
+
+def iter_wrapped_paragraphs(content, line_width, link_matcher):
+    r"""
+    Lazily wrap `content` paragraph by paragraph:
+    1) remove leftover [\d+] references
+    2) convert link occurrences to same-width placeholders (preserving case)
     3) textwrap
-    4) re-inject placeholders with bracket text
-    5) do a second textwrap pass to ensure lines never exceed line_width
+    4) re-inject bracket text in one pass, in order of appearance, recording
+       where each link landed as (line_idx, start, end, link)
+
+    Yields (raw_line_idx, lines, link_positions, chars_consumed) for every
+    non-empty paragraph; line_idx in link_positions is relative to the
+    paragraph and chars_consumed counts `content` processed so far.
     """
-    # Step 1: placeholders
-    content, placeholders = linkify_preserving_case(content, links)
-    # Step 2: remove e.g. [1], [2], etc.
+    content = content.replace(PLACEHOLDER_START, "").replace(PLACEHOLDER_FILL, "")
+    # Step 1: remove e.g. [1], [2], etc.
     content = re.sub(r'\[\d+\]', '', content)
 
-    # Step 3: initial wrap
-    paras = content.split("\n\n") if "\n\n" in content else content.split("\n")
-    lines = []
-    for para in paras:
+    double = "\n\n" in content
+    sep = "\n\n" if double else "\n"
+    raw_idx = 0
+    consumed = 0
+    for para in content.split(sep):
+        next_raw_idx = raw_idx + (para.count("\n") + 2 if double else 1)
+        consumed += len(para) + len(sep)
         para = para.strip()
-        if para:
-            wrapped = textwrap.fill(para, width=line_width).splitlines()
-            lines.extend(wrapped)
-            lines.append("")
-    if lines and lines[-1] == "":
-        lines.pop()
+        if not para:
+            raw_idx = next_raw_idx
+            continue
+
+        # Step 2: placeholders
+        para, brackets = linkify_preserving_case(para, link_matcher)
+        # Step 3: wrap
+        lines = textwrap.fill(para, width=line_width).splitlines()
+
+        # Step 4: re-inject bracket text. A link wider than the line may have
+        # been split by textwrap; a bare run of PLACEHOLDER_FILL continues it.
+        # Split links are not selectable, so they get no position.
+        link_positions = []
+        if brackets:
+            next_bracket = iter(brackets).__next__
+            current, current_link = "", None
+            offset = 0
+            line_idx = 0
+
+            def inject(m):
+                nonlocal current, current_link, offset
+                run = m.group(0)
+                if run[0] == PLACEHOLDER_START:
+                    (current, current_link), offset = next_bracket(), 0
+                    if len(run) == len(current):
+                        link_positions.append((line_idx, m.start(), m.end(), current_link))
+                piece = current[offset:offset + len(run)]
+                offset += len(run)
+                return piece
+
+            for line_idx in range(len(lines)):
+                lines[line_idx] = PLACEHOLDER_RE.sub(inject, lines[line_idx])
+
+        yield raw_idx, lines, link_positions, min(consumed, len(content))
+        raw_idx = next_raw_idx
+
+# An ANSI escape sequence starting at an ESC: CSI ("\033[2J", "\033[12A")
+# or a two-character sequence ("\033c"). Paced output is never cut inside one.
+ANSI_SEQUENCE_RE = re.compile(r'\x1b(?:\[[0-9;?]*[@-~]|.)', re.DOTALL)
+
+def escape_safe_cut(data, n):
+    """
+    Return a cut position >= n in `data` that does not split an ANSI escape
+    sequence, so either side can be sent (or dropped) on its own.
+    """
+    esc = data.rfind("\x1b", max(0, n - 16), n)
+    if esc >= 0:
+        m = ANSI_SEQUENCE_RE.match(data, esc)
+        if m and m.end() > n:
+            return m.end()
+    return n
+
+class UplinkScheduler:
+    """
+    Shared output budget for all sessions. Paced sessions send in small
+    chunks and take turns here in FIFO order, so one long page can't hog
+    the uplink while other users wait for an echo.
+    """
+    def __init__(self, bytes_per_sec):
+        self.rate = bytes_per_sec
+        self._lock = asyncio.Lock()
+        self._next_free = 0.0
+
+    async def acquire(self, n):
+        if not self.rate:
+            return
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            start = max(now, self._next_free)
+            self._next_free = start + n / self.rate
+            if start > now:
+                await asyncio.sleep(start - now)
+
+# Created in main() once the config is known.
+UPLINK = None
+
+def visible_width(row):
+    """Columns `row` takes on the terminal, not counting escape sequences."""
+    return len(ANSI_SEQUENCE_RE.sub("", row))
+
+class ScreenModel:
+    """
+    The rows a session's terminal currently shows, so that a redraw can send
+    only the rows that changed instead of clearing and repainting the whole
+    page. A frame is a list of rows; the cursor is left at the end of the
+    last one (the prompt).
+
+    Rows are addressed relative to the prompt row, like the rest of the
+    pager's in-place updates, so a frame that scrolled the terminal by a
+    line still lines up. With the width known, a row wider than the
+    terminal counts as the lines it wraps onto; a row that exactly fills
+    its last line leaves the cursor in the last column, where the next
+    "\r\n" (not the autowrap) moves on. A frame whose rows wrap onto a
+    different number of lines than before is drawn in full. Any other
+    output to the session invalidates the model (see SessionWriter.write),
+    and the next frame is drawn in full too.
+    """
+    def __init__(self):
+        self.rows = None
+        # Terminal height in rows and width in columns if known; rows
+        # above the height have scrolled off.
+        self.height = None
+        self.width = None
+        # Dumb terminals can't move the cursor: always repaint.
+        self.full_redraw_only = False
+
+    def invalidate(self):
+        self.rows = None
+
+    def render(self, writer, rows):
+        rows = list(rows)
+        out = "\033[2J\033[H" + "\r\n".join(rows)
+        if self.rows is not None and not self.full_redraw_only and len(rows) == len(self.rows):
+            delta = self._delta(rows)
+            if delta is not None and len(delta) < len(out):
+                out = delta
+        if out:
+            writer.write(out)
+        self.rows = rows
+
+    def _lines(self, row):
+        """Terminal lines `row` takes."""
+        if not self.width:
+            return 1
+        return max(1, -(-visible_width(row) // self.width))
+
+    def _fills_line(self, row):
+        """True if `row` ends in the last column, with the cursor left there."""
+        width = visible_width(row)
+        return bool(self.width) and width > 0 and width % self.width == 0
+
+    def _last_character(self, row):
+        """The last visible character of `row`, after the escape sequences before it."""
+        skip = visible_width(row) - 1
+        escapes = []
+        pos = 0
+        while skip > 0:
+            m = ANSI_SEQUENCE_RE.match(row, pos)
+            if m:
+                escapes.append(m.group())
+                pos = m.end()
+            else:
+                skip -= 1
+                pos += 1
+        return "".join(escapes) + row[pos:]
+
+    def _delta(self, rows):
+        """Cursor moves and changed rows turning self.rows into `rows`, or None if they can't be addressed."""
+        lines = [self._lines(row) for row in rows]
+        if lines != [self._lines(row) for row in self.rows]:
+            return None
+        starts = []
+        total = 0
+        for n in lines:
+            starts.append(total)
+            total += n
+        top = 0 if self.height is None else total - self.height
+        last = len(rows) - 1
+        end = total - 1  # the prompt's line
+        parts = []
+        cur = end
+        for i in range(len(rows)):
+            if rows[i] == self.rows[i] or starts[i] + lines[i] <= top:
+                continue
+            if starts[i] < top:
+                return None  # partly scrolled off
+            if starts[i] < cur:
+                parts.append(cursor_up(cur - starts[i]))
+            elif starts[i] > cur:
+                parts.append(cursor_down(starts[i] - cur))
+            parts.append("\r" + rows[i])
+            if not self._fills_line(rows[i]):
+                # in the last column this would erase the row's last character
+                parts.append(clear_line())
+            cur = starts[i] + lines[i] - 1
+        if not parts or rows[last] != self.rows[last]:
+            return "".join(parts)
+        # back to the end of the prompt
+        if cur < end:
+            parts.append(cursor_down(end - cur))
+        if self._fills_line(rows[last]):
+            # only printing into the last column leaves the cursor as it was
+            parts.append("\r")
+            if self.width > 1:
+                parts.append(f"\033[{self.width - 1}C")
+            parts.append(self._last_character(rows[last]))
+        else:
+            parts.append("\r")
+            column = visible_width(rows[last])
+            if self.width:
+                column %= self.width
+            if column:
+                parts.append(f"\033[{column}C")
+        return "".join(parts)
+
+class SessionWriter:
+    """
+    Per-session output coalescing in front of the telnetlib3 writer.
+
+    write() only buffers. drain() sends once FLUSH_BYTES are pending and
+    otherwise schedules a send within FLUSH_DELAY, so a page, a burst of AI
+    tokens or a spinner tick leave as one frame instead of one TCP segment
+    per write. SessionReader flushes before waiting for input, so the user
+    always sees everything before we block on a key.
+
+    With set_pacing() the writer only hands the socket what the terminal
+    link can absorb: flushed output goes to an outgoing queue that a sender
+    task trickles out at the baud rate (or at the rate the client is seen
+    to accept data, in "auto" mode), sharing UPLINK with other sessions.
+    Output still queued can then be dropped with discard_pending().
+    """
+    FLUSH_BYTES = 1024
+    FLUSH_DELAY = 0.02
+    # Paced sends cover this many seconds of link time each
+    PACE_SLICE = 0.1
+    # Chunk size and socket send buffer while estimating the rate ("auto")
+    AUTO_CHUNK = 256
+
+    def __init__(self, writer):
+        self._writer = writer
+        self._buffer = []
+        self._pending = 0
+        self._timer = None
+        self._outgoing = ""
+        self._sender = None
+        self.paced = False
+        self.bytes_per_sec = None      # fixed pacing rate, None = unpaced
+        self.estimated_bps = None      # measured in "auto" mode
+        # Output metrics. Characters, which equal bytes for the 8-bit
+        # encodings vintage terminals use.
+        self.bytes_out = 0
+        self.segments_out = 0
+        self.screen = ScreenModel()
+
+    def __getattr__(self, name):
+        return getattr(self._writer, name)
+
+    @property
+    def encoding(self):
+        return self._writer.encoding
+
+    @encoding.setter
+    def encoding(self, value):
+        self._writer.encoding = value
+
+    def set_pacing(self, baud):
+        """
+        baud: bits per second of the user's line (10 bits per byte on the
+        wire), "auto" to estimate it from how fast the client accepts data,
+        or None for unpaced output.
+        """
+        self.bytes_per_sec = None
+        self.paced = baud is not None
+        if baud == "auto":
+            # Keep the kernel and transport buffers small so that drain()
+            # completes at the rate the client actually ACKs our data.
+            sock = self._writer.get_extra_info("socket")
+            if sock is not None:
+                try:
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.AUTO_CHUNK * 8)
+                except OSError:
+                    pass
+            transport = getattr(self._writer, "transport", None)
+            if transport is not None:
+                transport.set_write_buffer_limits(high=self.AUTO_CHUNK)
+        elif baud:
+            self.bytes_per_sec = max(1.0, baud / 10.0)
+
+    def link_bytes_per_sec(self):
+        """Best known output rate of this session, or None if unknown/unpaced."""
+        return self.bytes_per_sec or self.estimated_bps
+
+    def write(self, data):
+        # ScreenModel.render() writes through here too and then re-validates
+        self.screen.invalidate()
+        self._buffer.append(data)
+        self._pending += len(data)
+
+    async def drain(self):
+        if self._pending >= self.FLUSH_BYTES:
+            await self.flush()
+        elif self._pending and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.FLUSH_DELAY, self._flush_later)
+
+    def _flush_later(self):
+        self._timer = None
+        if self._pending:
+            asyncio.ensure_future(self._flush_quietly())
+
+    async def _flush_quietly(self):
+        try:
+            await self.flush()
+        except Exception:
+            pass
+
+    def _take_buffered(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        data = "".join(self._buffer)
+        self._buffer.clear()
+        self._pending = 0
+        return data
+
+    def _send_now(self, data):
+        self._writer.write(data)
+        self.bytes_out += len(data)
+        self.segments_out += 1
+
+    async def flush(self):
+        data = self._take_buffered()
+        if not data:
+            return
+        if not self.paced and not (UPLINK and UPLINK.rate):
+            self._send_now(data)
+            await self._writer.drain()
+            return
+        # Paced: queue it and let the sender trickle it out. Don't wait, so
+        # the session can read keys (and discard) while the page goes out.
+        self._outgoing += data
+        if self._sender is None or self._sender.done():
+            self._sender = asyncio.ensure_future(self._send_outgoing())
+
+    def _chunk_size(self):
+        if self.bytes_per_sec:
+            return max(8, int(self.bytes_per_sec * self.PACE_SLICE))
+        return self.AUTO_CHUNK
+
+    async def _send_outgoing(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self._outgoing:
+                if UPLINK:
+                    await UPLINK.acquire(min(len(self._outgoing), self._chunk_size()))
+                    if not self._outgoing:
+                        break  # discarded while waiting for our turn
+                cut = escape_safe_cut(self._outgoing, self._chunk_size())
+                chunk, self._outgoing = self._outgoing[:cut], self._outgoing[cut:]
+                started = loop.time()
+                self._send_now(chunk)
+                await self._writer.drain()
+                if self.bytes_per_sec:
+                    # what is left of the time this chunk occupies the line
+                    rest = len(chunk) / self.bytes_per_sec - (loop.time() - started)
+                    if rest > 0:
+                        await asyncio.sleep(rest)
+                elif self.paced:
+                    elapsed = loop.time() - started
+                    if elapsed > 0.001:
+                        rate = len(chunk) / elapsed
+                        self.estimated_bps = rate if self.estimated_bps is None \
+                            else 0.8 * self.estimated_bps + 0.2 * rate
+        except Exception:
+            self._outgoing = ""
+
+    def pending_output(self):
+        """Characters written but not yet handed to the socket."""
+        return self._pending + len(self._outgoing)
+
+    def discard_pending(self):
+        """
+        Drop everything not yet handed to the socket, e.g. the rest of a page
+        the user has already skipped. Chunks are cut at escape sequence
+        boundaries, so the terminal is never left inside a sequence.
+        """
+        dropped = self.pending_output()
+        if dropped:
+            self.screen.invalidate()
+        self._take_buffered()
+        self._outgoing = ""
+        return dropped
+
+    def close(self):
+        data = self._outgoing + self._take_buffered()
+        self._outgoing = ""
+        if data:
+            self._send_now(data)
+        if self._sender is not None:
+            self._sender.cancel()
+        self._writer.close()
+
+class SessionReader:
+    """
+    Reader wrapper that flushes the session's SessionWriter before it would
+    block waiting for input.
+    """
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
 
-    # Step 4: re-inject bracket text
-    for i in range(len(lines)):
-        for placeholder, bracket_text in placeholders.items():
-            lines[i] = lines[i].replace(placeholder, bracket_text)
+    def __getattr__(self, name):
+        return getattr(self._reader, name)
 
-    # Step 5: final re-wrap
-    lines = final_wrap_after_injection(lines, line_width)
-    return lines
+    async def read(self, n=-1):
+        # Input already buffered (typing ahead, pasted text) returns at once;
+        # let the output keep coalescing in that case.
+        if not getattr(self._reader, "_buffer", None):
+            await self._writer.flush()
+        return await self._reader.read(n)
 
 async def read_line_custom(writer, reader):
     buffer = []
@@ -201,22 +728,195 @@ def clear_line():
 TOC_GO_TO_ARTICLE_START = -999
 SPINNER_CHARS = ["|", "/", "-", "\\"]
 SPIN_INTERVAL = 0.25
+# Longest the AI server may hold back tokens to send them as one frame
+AI_BATCH_MS = 40
+
+class AIStream:
+    """
+    One question in flight on a shared AI connection. Frames from the AI
+    server ({"type": "token"|"status"|"error"|"end", "text": ...}) arrive in
+    `frames`; "end" is always the last one.
+    """
+    def __init__(self, conn, request_id):
+        self.conn = conn
+        self.request_id = request_id
+        self.frames = asyncio.Queue()
+        self.ended = False
+
+    async def next_frame(self, timeout):
+        frame = await asyncio.wait_for(self.frames.get(), timeout=timeout)
+        if frame.get("type") == "end":
+            self.ended = True
+        return frame
+
+    async def cancel(self):
+        """Tell the AI server to stop generating, unless it already finished."""
+        if not self.ended:
+            self.ended = True
+            await self.conn.cancel(self.request_id)
+
+class AIConnection:
+    """
+    A persistent websocket to the AI server that many sessions' questions
+    share, told apart by request_id. Keepalive pings detect dead links; a
+    dropped connection ends the requests on it and is re-established in the
+    background with exponential backoff, so the next question doesn't pay
+    for the TCP, TLS and websocket handshakes.
+    """
+    CONNECT_TIMEOUT = 10
+    PING_INTERVAL = 20
+    BACKOFF_MIN = 0.5
+    BACKOFF_MAX = 30.0
+
+    def __init__(self, conf):
+        self.conf = conf
+        self.uri = conf["AI_URI"]
+        self.ssl_context = None
+        if self.uri.startswith("wss:"):
+            self.ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            self.ssl_context.check_hostname = False
+            self.ssl_context.verify_mode = ssl.CERT_NONE
+        self._ws = None
+        self._streams = {}
+        self._lock = asyncio.Lock()
+        self._backoff = 0.0
+        self._next_attempt = 0.0
+        self._keeper = None
+
+    def connected(self):
+        # _read_frames clears _ws as soon as the link drops
+        return self._ws is not None
+
+    def active_requests(self):
+        return len(self._streams)
+
+    async def _connect(self):
+        async with self._lock:
+            if self.connected():
+                return self._ws
+            loop = asyncio.get_running_loop()
+            wait = self._next_attempt - loop.time()
+            if wait > 0:
+                raise ConnectionError(f"AI server unreachable, retrying in {wait:.0f}s")
+            try:
+                ws = await asyncio.wait_for(
+                    websockets.connect(
+                        self.uri, ssl=self.ssl_context,
+                        ping_interval=self.PING_INTERVAL, ping_timeout=self.PING_INTERVAL
+                    ),
+                    timeout=self.CONNECT_TIMEOUT
+                )
+            except Exception:
+                self._backoff = min(self.BACKOFF_MAX, max(self.BACKOFF_MIN, self._backoff * 2))
+                self._next_attempt = loop.time() + self._backoff
+                raise
+            self._backoff = 0.0
+            self._ws = ws
+            asyncio.ensure_future(self._read_frames(ws))
+            telnet_debug_print(self.conf, "AI connection established:", self.uri)
+            return ws
+
+    async def _read_frames(self, ws):
+        try:
+            async for message in ws:
+                try:
+                    frame = json.loads(message)
+                except ValueError:
+                    continue
+                stream = self._streams.get(frame.get("request_id"))
+                if stream is None:
+                    continue  # cancelled on our side
+                stream.frames.put_nowait(frame)
+                if frame.get("type") == "end":
+                    del self._streams[stream.request_id]
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            telnet_debug_print(self.conf, "AI connection lost:", self.uri)
+            if self._ws is ws:
+                self._ws = None
+            streams, self._streams = self._streams, {}
+            for stream in streams.values():
+                stream.frames.put_nowait({"type": "end"})
+            self.keep_connected()
+
+    def keep_connected(self):
+        """(Re)connect in the background, backing off while the server is down."""
+        if self._keeper is None or self._keeper.done():
+            self._keeper = asyncio.ensure_future(self._keep_connected())
+
+    async def _keep_connected(self):
+        loop = asyncio.get_running_loop()
+        while not self.connected():
+            try:
+                await self._connect()
+            except Exception as e:
+                telnet_debug_print(self.conf, "AI reconnect failed:", e)
+                await asyncio.sleep(max(self.BACKOFF_MIN, self._next_attempt - loop.time()))
+
+    async def request(self, payload):
+        ws = await self._connect()
+        request_id = uuid.uuid4().hex
+        stream = AIStream(self, request_id)
+        self._streams[request_id] = stream
+        try:
+            await ws.send(json.dumps(dict(payload, type="request", request_id=request_id)))
+        except Exception:
+            self._streams.pop(request_id, None)
+            raise
+        return stream
+
+    async def cancel(self, request_id):
+        self._streams.pop(request_id, None)
+        if self.connected():
+            try:
+                await self._ws.send(json.dumps({"type": "cancel", "request_id": request_id}))
+            except websockets.exceptions.ConnectionClosed:
+                pass
+
+class AIConnectionPool:
+    """
+    A few AIConnections to the AI server; each question goes to the
+    connected one with the fewest requests in flight.
+    """
+    def __init__(self, conf, size):
+        self.connections = [AIConnection(conf) for _ in range(size)]
+
+    def start(self):
+        for conn in self.connections:
+            conn.keep_connected()
+
+    async def request(self, payload):
+        live = [c for c in self.connections if c.connected()]
+        conn = min(live or self.connections, key=lambda c: c.active_requests())
+        return await conn.request(payload)
+
+# Created in main() when the AI assistant is activated.
+AI_POOL = None
 
 async def stream_ai_with_spinner_and_interrupts(
     conf,
     question, article_context, article_page,
-    user_id, conversation_history, writer, reader, max_width=80
+    user_id, conversation_history, writer, reader, max_width=80,
+    article_title=None, page_size=None
 ):
     """
-    Connect to the AI server over websockets using conf["AI_URI"].
+    Ask the AI server (conf["AI_URI"]) over the shared AI_POOL connections
+    and stream the answer to the terminal.
     """
     payload = {
         "user_id": user_id,
         "conversation": conversation_history,
         "context": article_context,
         "page_index": article_page,
+        "page_size": page_size,
+        # lets the AI server reuse its passage index for this article
+        "title": article_title,
         "new_question": question,
-        "auth_token": "AAAAB3NzaC1yc2EAAAADAQABAAABAQDBg"  # example placeholder
+        "auth_token": "AAAAB3NzaC1yc2EAAAADAQABAAABAQDBg",  # example placeholder
+        # token batching: slow links get bigger, rarer frames
+        "batch_ms": AI_BATCH_MS,
+        "bytes_per_sec": writer.link_bytes_per_sec()
     }
 
     partial_tokens = []
@@ -226,62 +926,80 @@ async def stream_ai_with_spinner_and_interrupts(
     user_cleared = False
     last_token_time = asyncio.get_event_loop().time()
     spinner_index = 0
-
-    ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
-    ssl_context.check_hostname = False
-    ssl_context.verify_mode = ssl.CERT_NONE
-
-    uri = conf["AI_URI"]
+    # "(queued: N)" while the AI server has no free model slot for us
+    queue_note = ""
 
     async def read_websocket():
-        nonlocal stop_flag, last_token_time, current_line
+        nonlocal stop_flag, last_token_time, current_line, queue_note
+        stream = None
         try:
-            async with websockets.connect(uri, ping_interval=None, ssl=ssl_context) as ws:
-                await ws.send(json.dumps(payload))
-                writer.write("MULTIVAC> ")
-                await writer.drain()
-                while not stop_flag:
-                    try:
-                        chunk = await asyncio.wait_for(ws.recv(), timeout=SPIN_INTERVAL)
-                        tokens = re.findall(r'\S+|\s+', chunk)
-                        for token in tokens:
+            stream = await AI_POOL.request(payload)
+            writer.write("MULTIVAC> ")
+            await writer.drain()
+            while not stop_flag:
+                try:
+                    frame = await stream.next_frame(SPIN_INTERVAL)
+                except asyncio.TimeoutError:
+                    continue
+                if frame.get("type") == "end":
+                    break
+                if frame.get("type") == "queue":
+                    # replaces the spinner, cursor stays in front of it
+                    position = frame.get("text", "0")
+                    erase = " " * len(queue_note) + "\b" * len(queue_note)
+                    queue_note = f"(queued: {position})" if position != "0" else ""
+                    writer.write(erase + queue_note + "\b" * len(queue_note))
+                    await writer.drain()
+                    last_token_time = asyncio.get_event_loop().time()
+                    continue
+                chunk = frame.get("text", "")
+                if frame.get("type") == "status":
+                    # e.g. a web search: what came before is not part of
+                    # the answer, which starts on a fresh line below
+                    partial_tokens.clear()
+                    writer.write(("\r\n" if current_line else "") + f"({chunk})\r\nMULTIVAC> ")
+                    await writer.drain()
+                    current_line = ""
+                    last_token_time = asyncio.get_event_loop().time()
+                    continue
+                tokens = re.findall(r'\S+|\s+', chunk)
+                for token in tokens:
+                    if stop_flag:
+                        break
+                    token_text = telnet_fix_newlines(token)
+                    if "\n" in token_text:
+                        parts = token_text.split("\n")
+                        for i, part in enumerate(parts):
                             if stop_flag:
                                 break
-                            token_text = telnet_fix_newlines(token)
-                            if "\n" in token_text:
-                                parts = token_text.split("\n")
-                                for i, part in enumerate(parts):
-                                    if stop_flag:
-                                        break
-                                    if len(current_line) + len(part) > max_width:
-                                        writer.write("\r\n")
-                                        await writer.drain()
-                                        current_line = ""
-                                    current_line += part
-                                    writer.write(part)
-                                    await writer.drain()
-                                    if i < len(parts) - 1:
-                                        writer.write("\r\n")
-                                        await writer.drain()
-                                        current_line = ""
-                                partial_tokens.append(token_text)
-                            else:
-                                if len(current_line) + len(token_text) > max_width:
-                                    writer.write("\r\n")
-                                    await writer.drain()
-                                    current_line = ""
-                                current_line += token_text
-                                writer.write(token_text)
+                            if len(current_line) + len(part) > max_width:
+                                writer.write("\r\n")
                                 await writer.drain()
-                                partial_tokens.append(token_text)
-                        last_token_time = asyncio.get_event_loop().time()
-                    except asyncio.TimeoutError:
-                        continue
-                    except websockets.exceptions.ConnectionClosed:
-                        break
+                                current_line = ""
+                            current_line += part
+                            writer.write(part)
+                            await writer.drain()
+                            if i < len(parts) - 1:
+                                writer.write("\r\n")
+                                await writer.drain()
+                                current_line = ""
+                        partial_tokens.append(token_text)
+                    else:
+                        if len(current_line) + len(token_text) > max_width:
+                            writer.write("\r\n")
+                            await writer.drain()
+                            current_line = ""
+                        current_line += token_text
+                        writer.write(token_text)
+                        await writer.drain()
+                        partial_tokens.append(token_text)
+                last_token_time = asyncio.get_event_loop().time()
         except Exception as e:
             telnet_debug_print(conf, "WebSocket AI error:", e)
         finally:
+            if stream is not None:
+                # q/c pressed: stop the generation on the AI server too
+                await stream.cancel()
             writer.write("\r\n")
             await writer.drain()
             stop_flag = True
@@ -291,7 +1009,11 @@ async def stream_ai_with_spinner_and_interrupts(
         while not stop_flag:
             ckey = await reader.read(1)
             if not ckey:
-                continue
+                # client disconnected: read() returns "" at once from now
+                # on, so stop here and have the AI server drop the request
+                user_canceled = True
+                stop_flag = True
+                return
             if ckey.lower() == 'q':
                 user_canceled = True
                 stop_flag = True
@@ -304,7 +1026,7 @@ async def stream_ai_with_spinner_and_interrupts(
         nonlocal spinner_index, stop_flag
         while not stop_flag:
             now = asyncio.get_event_loop().time()
-            if now - last_token_time >= SPIN_INTERVAL:
+            if not queue_note and now - last_token_time >= SPIN_INTERVAL:
                 spin_char = SPINNER_CHARS[spinner_index % len(SPINNER_CHARS)]
                 spinner_index += 1
                 try:
@@ -352,16 +1074,13 @@ async def paginate(lines, writer, reader, page_size):
     page_index = total_pages - 1
 
     while True:
-        writer.write("\033[2J\033[H")
         start = page_index * page_size
         end = start + page_size
-        for line in lines[start:end]:
-            writer.write(line + "\r\n")
-
         if page_index < total_pages - 1:
-            writer.write(f"\r\n-- Page {page_index+1}/{total_pages} -- (Enter/l=next, h=prev, q=exit): ")
+            footer = f"-- Page {page_index+1}/{total_pages} -- (Enter/l=next, h=prev, q=exit): "
         else:
-            writer.write(f"\r\n-- Page {page_index+1}/{total_pages} -- (Enter/l/q=exit, h=prev): ")
+            footer = f"-- Page {page_index+1}/{total_pages} -- (Enter/l/q=exit, h=prev): "
+        writer.screen.render(writer, lines[start:end] + ["", footer])
 
         await writer.drain()
         key = await reader.read(1)
@@ -380,6 +1099,9 @@ async def paginate(lines, writer, reader, page_size):
             else:
                 key = "??"
 
+        # Don't make the user wait for the rest of a page they are leaving
+        writer.discard_pending()
+
         if key in ("\r", "\n", "l"):
             if page_index < total_pages - 1:
                 page_index += 1
@@ -399,7 +1121,8 @@ async def show_ai_conversation_overlay(
     article_text, article_page,
     user_id, line_width, page_size,
     is_top_level=False,
-    initial_question=None
+    initial_question=None,
+    article_title=None
 ):
     conversation = []
 
@@ -453,7 +1176,8 @@ async def show_ai_conversation_overlay(
                 conf,
                 question, article_text, article_page,
                 user_id, conversation,
-                writer, reader, line_width
+                writer, reader, line_width,
+                article_title=article_title, page_size=page_size
             )
             if canceled:
                 if final_text == "":
@@ -480,32 +1204,19 @@ async def select_option(options, writer, reader, page_size, prompt, previous_pag
         return sel // page_size
 
     def print_full_page(page_idx, sel_idx, digits):
-        writer.write("\033[2J\033[H")
+        # Only rows that differ from what is on screen are sent, so moving
+        # the selection or typing a digit rewrites a line or two.
         start = page_idx * page_size
         end = min(start + page_size, total)
+        rows = []
         for i in range(start, end):
             arrow = "-> " if i == sel_idx else "   "
-            writer.write(f"{i}. {arrow}{display_options[i]}\r\n")
-        writer.write(f"\r\n-- Page {page_idx+1}/{total_pages} -- {prompt} {digits}\r\n")
+            rows.append(f"{i}. {arrow}{display_options[i]}")
+        rows += ["", f"-- Page {page_idx+1}/{total_pages} -- {prompt} {digits}", ""]
+        writer.screen.render(writer, rows)
 
     async def update_selection_inplace(old_sel, new_sel):
-        page_start = cur_page * page_size
-        page_end = min(page_start + page_size, total)
-        lines_in_page = page_end - page_start
-        old_offset = old_sel - page_start
-        new_offset = new_sel - page_start
-        lines_to_move_up = (lines_in_page + 2 - old_offset)
-        writer.write(cursor_up(lines_to_move_up) + cursor_carriage_return() + clear_line())
-        writer.write(f"{old_sel}.    {display_options[old_sel]}")
-        diff = old_offset - new_offset
-        if diff > 0:
-            writer.write(cursor_up(diff))
-        elif diff < 0:
-            writer.write(cursor_down(-diff))
-        writer.write(cursor_carriage_return() + clear_line())
-        writer.write(f"{new_sel}. -> {display_options[new_sel]}")
-        lines_back_down = (lines_in_page + 2 - new_offset)
-        writer.write(cursor_down(lines_back_down) + cursor_carriage_return())
+        print_full_page(cur_page, new_sel, digit_buffer)
         await writer.drain()
 
     cur_page = current_page(selected)
@@ -518,8 +1229,7 @@ async def select_option(options, writer, reader, page_size, prompt, previous_pag
             return None
         if key.isdigit():
             digit_buffer += key
-            writer.write(cursor_up(1) + cursor_carriage_return() + clear_line())
-            writer.write(f"-- Page {cur_page+1}/{total_pages} -- {prompt} {digit_buffer}\r\n")
+            print_full_page(cur_page, selected, digit_buffer)
             await writer.drain()
             continue
 
@@ -672,59 +1382,439 @@ async def loading_dots(writer):
     except asyncio.CancelledError:
         pass
 
+# ---------------- Non-blocking Wikipedia client ----------------
+#
+# The `wikipedia` package is synchronous (requests under the hood) and its
+# WikipediaPage loads .content/.links lazily on first access. Every call into
+# it therefore has to happen inside WIKI_EXECUTOR, otherwise one slow article
+# freezes all telnet sessions (echo, spinners, paging).
+
+# Created in main() once the config is known.
+WIKI_EXECUTOR = None
+
+class WikiHTTP:
+    """
+    Stands in for `requests` inside the wikipedia package, which calls
+    requests.get() without a timeout. run_wiki_call's timeout only stops
+    waiting; with a socket timeout a stalled MediaWiki call also gives its
+    WIKI_EXECUTOR thread back instead of holding it forever.
+    """
+    def __init__(self, timeout):
+        self.timeout = timeout
+
+    def get(self, *args, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return requests.get(*args, **kwargs)
+
+class WikiFetchCancelled(Exception):
+    """Raised when the user aborts a pending Wikipedia lookup."""
+
+def _wiki_search_blocking(query):
+    return wikipedia.search(query)
+
+class WikiArticle:
+    """
+    One Wikipedia page as the pager needs it, independent of terminal width:
+    markup-free text, usable links and the table of contents.
+    """
+    def __init__(self, title, content, links, toc=None):
+        self.title = title
+        self.content = content
+        self.links = links
+        self.link_matcher = LinkMatcher(links)
+        if toc is None:
+            self.toc, self.raw_lines = extract_toc_and_lines(content)
+        else:
+            self.toc, self.raw_lines = toc, content.split("\n")
+
+    def size(self):
+        return len(self.content) + sum(len(l) for l in self.links) + self.link_matcher.size
+
+def _wiki_page_blocking(title):
+    """
+    Fetch and pre-process a page. Disambiguation and missing pages are
+    returned (not raised) so that the article cache can remember them too.
+    """
+    try:
+        page = wikipedia.page(title=title, auto_suggest=False, preload=False)
+        # .content and .links are lazy and hit the network on first access
+        content = remove_wiki_markup(page.content)
+        links = [l for l in page.links if len(l) > 1]
+    except (wikipedia.DisambiguationError, wikipedia.PageError) as e:
+        return e
+    content = re.sub(r'\n\s+', '\n', content)
+    return WikiArticle(page.title, content, links)
+
+async def run_wiki_call(conf, func, *args):
+    """
+    Run a blocking MediaWiki call in WIKI_EXECUTOR with conf["WIKI_TIMEOUT"].
+    Cancelling the awaiting task releases the session immediately; the worker
+    thread finishes (and its result is dropped) in the background.
+    """
+    loop = asyncio.get_running_loop()
+    fut = loop.run_in_executor(WIKI_EXECUTOR, functools.partial(func, *args))
+    return await asyncio.wait_for(fut, timeout=conf["WIKI_TIMEOUT"])
+
+# Upstream MediaWiki round trips, e.g. to check that opening an article
+# costs exactly one page fetch.
+WIKI_FETCH_COUNTS = {"search": 0, "page": 0}
+
+async def wiki_search(conf, query):
+    WIKI_FETCH_COUNTS["search"] += 1
+    return await run_wiki_call(conf, _wiki_search_blocking, query)
+
+class ArticleCache:
+    """
+    Process-wide LRU/TTL cache of WikiArticle results keyed by (lang, title),
+    shared by all telnet sessions. Concurrent misses for the same key share a
+    single upstream fetch. Values may also be DisambiguationError/PageError
+    instances, which wiki_article() re-raises.
+    """
+    def __init__(self, max_entries, max_bytes, ttl, negative_ttl):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._inflight = {}            # key -> asyncio.Task
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, _, value = item
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if isinstance(value, WikiArticle):
+            ttl, size = self.ttl, value.size()
+        else:
+            ttl = self.ttl if isinstance(value, wikipedia.DisambiguationError) else self.negative_ttl
+            size = 256
+        if size > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + ttl, size, value)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self._bytes -= item[1]
+
+    async def get_or_fetch(self, key, fetch):
+        """
+        Return the cached value for `key`, or await `fetch()` exactly once for
+        all concurrent callers. The shared fetch keeps running (and fills the
+        cache) even if the caller that started it is cancelled.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+
+            def _done(t, key=key):
+                self._inflight.pop(key, None)
+                if not t.cancelled() and t.exception() is None:
+                    self.put(key, t.result())
+            task.add_done_callback(_done)
+        return await asyncio.shield(task)
+
+class DiskArticleStore:
+    """
+    Optional SQLite-backed article store behind ARTICLE_CACHE. Articles read
+    recently survive restarts, and stale copies are served when Wikipedia is
+    slow or rate-limits us. The total stored size is capped; the least
+    recently read articles are evicted first. All methods are blocking and
+    meant to run in DISK_EXECUTOR.
+    """
+    def __init__(self, path, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS articles ("
+                " lang TEXT, title TEXT, content TEXT, links TEXT, toc TEXT,"
+                " size INTEGER, fetched_at REAL, accessed_at REAL,"
+                " PRIMARY KEY (lang, title))"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS redirects ("
+                " lang TEXT, alias TEXT, title TEXT, PRIMARY KEY (lang, alias))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS articles_lru ON articles (accessed_at)")
+
+    def load(self, lang, title):
+        """
+        Return (WikiArticle, is_fresh) or (None, False). Redirect aliases
+        resolve to the stored target page.
+        """
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT a.title, a.content, a.links, a.toc, a.fetched_at FROM articles a"
+                " WHERE a.lang = ? AND a.title = COALESCE("
+                "  (SELECT r.title FROM redirects r WHERE r.lang = ? AND r.alias = ?), ?)",
+                (lang, lang, title, title)
+            ).fetchone()
+            if row is None:
+                return None, False
+            stored_title, content, links, toc, fetched_at = row
+            self._db.execute(
+                "UPDATE articles SET accessed_at = ? WHERE lang = ? AND title = ?",
+                (time.time(), lang, stored_title)
+            )
+        article = WikiArticle(stored_title, content, json.loads(links),
+                              [tuple(t) for t in json.loads(toc)])
+        return article, time.time() - fetched_at < self.ttl
+
+    def save(self, lang, title, article):
+        size = len(article.content.encode("utf-8")) + sum(len(l) for l in article.links)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (lang, article.title, article.content, json.dumps(article.links),
+                 json.dumps(article.toc), size, now, now)
+            )
+            if title != article.title:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO redirects VALUES (?, ?, ?)",
+                    (lang, title, article.title)
+                )
+            self._evict()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM articles").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for lang, title, size in self._db.execute(
+            "SELECT lang, title, size FROM articles ORDER BY accessed_at"
+        ).fetchall():
+            self._db.execute("DELETE FROM articles WHERE lang = ? AND title = ?", (lang, title))
+            self._db.execute("DELETE FROM redirects WHERE lang = ? AND title = ?", (lang, title))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+# Created in main() once the config is known. DISK_STORE stays None unless
+# [cache] disk_enabled is set. It has a thread of its own: stale copies
+# must stay readable while every WIKI_EXECUTOR thread waits on Wikipedia.
+ARTICLE_CACHE = None
+DISK_STORE = None
+DISK_EXECUTOR = None
+# Writes to DISK_STORE still running
+DISK_SAVES = set()
+
+def _disk_save_done(fut):
+    DISK_SAVES.discard(fut)
+    if not fut.cancelled() and fut.exception() is not None:
+        print("Disk store write error:", fut.exception())
+
+async def wiki_article(conf, title):
+    """
+    Return the WikiArticle for `title`, going through ARTICLE_CACHE. Raises
+    wikipedia.DisambiguationError / wikipedia.PageError like wikipedia.page().
+    """
+    lang = conf["LANG"]
+
+    async def fetch():
+        stored = None
+        if DISK_STORE:
+            try:
+                stored, fresh = await asyncio.get_running_loop().run_in_executor(
+                    DISK_EXECUTOR, DISK_STORE.load, lang, title
+                )
+            except Exception as e:
+                telnet_debug_print(conf, "Disk store read error:", e)
+                stored, fresh = None, False
+            if stored and fresh:
+                return stored
+
+        WIKI_FETCH_COUNTS["page"] += 1
+        try:
+            value = await run_wiki_call(conf, _wiki_page_blocking, title)
+        except Exception as e:
+            if stored:
+                # Wikipedia is slow or refusing us; a stale copy beats an error.
+                telnet_debug_print(conf, f"Serving stale '{title}' from disk store:", e)
+                return stored
+            raise
+
+        # Redirects resolve to another title; remember that key as well.
+        if isinstance(value, WikiArticle) and value.title != title:
+            ARTICLE_CACHE.put((lang, value.title), value)
+        if DISK_STORE and isinstance(value, WikiArticle):
+            save = asyncio.get_running_loop().run_in_executor(
+                DISK_EXECUTOR, DISK_STORE.save, lang, title, value
+            )
+            DISK_SAVES.add(save)
+            save.add_done_callback(_disk_save_done)
+        return value
+
+    value = await ARTICLE_CACHE.get_or_fetch((lang, title), fetch)
+    telnet_debug_print(conf, f"Article cache: hits={ARTICLE_CACHE.hits} misses={ARTICLE_CACHE.misses} "
+                             f"entries={len(ARTICLE_CACHE._entries)} bytes={ARTICLE_CACHE._bytes}")
+    if isinstance(value, Exception):
+        raise value.with_traceback(None)
+    return value
+
+async def await_cancellable_by_key(reader, coro, cancel_keys=("q",)):
+    """
+    Await `coro` while watching the keyboard. Pressing one of `cancel_keys`
+    (or the client disconnecting) cancels it and raises WikiFetchCancelled.
+    Other keys typed while waiting are ignored.
+    """
+    work = asyncio.ensure_future(coro)
+    key_task = asyncio.ensure_future(reader.read(1))
+    try:
+        while True:
+            done, _ = await asyncio.wait([work, key_task], return_when=asyncio.FIRST_COMPLETED)
+            if work in done:
+                return work.result()
+            key = key_task.result()
+            if not key or key.lower() in cancel_keys:
+                work.cancel()
+                raise WikiFetchCancelled()
+            key_task = asyncio.ensure_future(reader.read(1))
+    finally:
+        for t in (work, key_task):
+            if not t.done():
+                t.cancel()
+
+class RenderedArticle:
+    """
+    A WikiArticle wrapped for one terminal width. This is everything
+    paginate_article needs, so opening an article costs one upstream fetch.
+
+    Wrapping is lazy: wrapped_lines and link_positions grow paragraph by
+    paragraph as pages are asked for (ensure_lines) or while
+    render_in_background() runs, so page 1 is shown before a long article
+    is fully processed. Until `done`, total_lines() is an estimate.
+    """
+    # Seconds of wrapping per event loop turn in render_in_background()
+    RENDER_SLICE = 0.005
+
+    def __init__(self, article, line_width):
+        self.title = article.title
+        self.links = article.links
+        self.toc = article.toc
+        self.line_width = line_width
+        self.wrapped_lines = []
+        self.link_positions = []
+        self.done = False
+        self._content_length = max(1, len(article.content))
+        self._consumed = 0
+        # Where each paragraph starts: raw line index -> wrapped line index
+        self._para_starts_raw = []
+        self._para_starts_line = []
+        self._paragraphs = iter_wrapped_paragraphs(article.content, line_width, article.link_matcher)
+
+    def _render_paragraph(self):
+        try:
+            raw_idx, lines, para_links, consumed = next(self._paragraphs)
+        except StopIteration:
+            self.done = True
+            self._paragraphs = None
+            return
+        if self.wrapped_lines:
+            self.wrapped_lines.append("")
+        base = len(self.wrapped_lines)
+        self._para_starts_raw.append(raw_idx)
+        self._para_starts_line.append(base)
+        self.wrapped_lines.extend(lines)
+        self.link_positions.extend((base + i, start, end, link) for i, start, end, link in para_links)
+        self._consumed = consumed
+
+    def ensure_lines(self, n):
+        """Wrap until at least `n` lines exist or the article ends."""
+        while not self.done and len(self.wrapped_lines) < n:
+            self._render_paragraph()
+        return len(self.wrapped_lines)
+
+    def finish(self):
+        while not self.done:
+            self._render_paragraph()
+
+    def total_lines(self):
+        lines = len(self.wrapped_lines)
+        if self.done or not self._consumed:
+            return lines
+        return max(lines, lines * self._content_length // self._consumed)
+
+    def chapter_line(self, toc_idx):
+        """
+        Wrapped line on which TOC chapter `toc_idx` starts, recorded while
+        wrapping, so a TOC jump never re-wraps the text before the heading.
+        """
+        chapter_raw = self.toc[toc_idx][1]
+        while not self.done and (not self._para_starts_raw or self._para_starts_raw[-1] < chapter_raw):
+            self._render_paragraph()
+        i = bisect.bisect_right(self._para_starts_raw, chapter_raw) - 1
+        return self._para_starts_line[i] if i >= 0 else 0
+
+    async def render_in_background(self):
+        loop = asyncio.get_running_loop()
+        while not self.done:
+            deadline = loop.time() + self.RENDER_SLICE
+            while not self.done and loop.time() < deadline:
+                self._render_paragraph()
+            await asyncio.sleep(0)
+
 async def paginate_article(
     conf,
-    wrapped_lines, writer, reader,
+    article, writer, reader,
     page_size, line_width,
-    raw_lines, toc,
-    initial_page=0,
-    page_title=None
+    user_id, initial_page=0
 ):
-    user_id = str(uuid.uuid4())
-    total_lines = len(wrapped_lines)
-    if total_lines == 0:
+    wrapped_lines = article.wrapped_lines  # grows while the article renders
+    toc = article.toc
+    if article.ensure_lines(1) == 0:
         writer.write("Article is empty.\r\n")
         await writer.drain()
         return
-    total_pages = (total_lines + page_size - 1) // page_size
     page_index = initial_page
 
     search_state = ArticleSearchState()
     need_reprint = True
     keep_going = True
 
-    page = None
-    if page_title:
-        wikipedia.set_lang(conf["LANG"])
-        try:
-            page = wikipedia.page(title=page_title, auto_suggest=False)
-        except:
-            pass
+    def total_pages():
+        return max(1, (article.total_lines() + page_size - 1) // page_size)
 
-    links = [l for l in (page.links if page else []) if len(l) > 1]
-    link_positions = []
+    def is_last_page(page_idx):
+        return article.ensure_lines((page_idx + 1) * page_size + 1) <= (page_idx + 1) * page_size
 
-    def find_links_in_lines():
-        nonlocal link_positions
-        link_positions.clear()
-        full_text = "\n".join(wrapped_lines)
-        for link in links:
-            rgx = re.compile(r'\[' + re.escape(link) + r'\]', re.IGNORECASE)
-            for m in rgx.finditer(full_text):
-                start_line = full_text[:m.start()].count("\n")
-                line_start = full_text.rfind("\n", 0, m.start()) + 1 if start_line > 0 else 0
-                link_positions.append((start_line,
-                                       m.start() - line_start,
-                                       m.end() - line_start,
-                                       link))
-        link_positions.sort()
-
-    find_links_in_lines()
+    # Link positions come from wrapping; bucket them by page as they appear
+    # so that per-keystroke lookups don't scan the whole article.
+    links_by_page = {}
+    links_indexed = 0
 
     def get_page_links(page_idx):
-        start = page_idx * page_size
-        end = min(start + page_size, total_lines)
-        return [lp for lp in link_positions if start <= lp[0] < end]
+        nonlocal links_indexed
+        positions = article.link_positions
+        while links_indexed < len(positions):
+            lp = positions[links_indexed]
+            links_by_page.setdefault(lp[0] // page_size, []).append(lp)
+            links_indexed += 1
+        return links_by_page.get(page_idx, [])
 
     def highlight_lines_with_links(page_lines, page_idx, sel_link_idx):
         page_links = get_page_links(page_idx)
@@ -742,56 +1832,45 @@ async def paginate_article(
                 out_lines[i] = highlight_line(line, search_state.term)
         return out_lines
 
+    def render_page(page_idx, sel_link_idx):
+        start = page_idx * page_size
+        end = min(start + page_size, article.ensure_lines(start + page_size))
+        page_lines = highlight_lines_with_links(wrapped_lines[start:end], page_idx, sel_link_idx)
+        # "~" marks a page count estimated while the article still renders
+        pages_label = f"{total_pages()}" if article.done else f"~{total_pages()}"
+
+        # If AI is not activated, omit 'a=AI' from the prompt
+        if conf["AI_ACTIVATED"]:
+            footer = (f"-- Page {page_idx+1}/{pages_label} -- "
+                      f"(l=next, h=prev, t=TOC, q=exit, j/k=links, s/d=search, a=AI): ")
+        else:
+            footer = (f"-- Page {page_idx+1}/{pages_label} -- "
+                      f"(l=next, h=prev, t=TOC, q=exit, j/k=links, s/d=search): ")
+        writer.screen.render(writer, page_lines + ["", footer])
+
     async def update_link_selection(old_idx, new_idx, page_idx):
-        page_links = get_page_links(page_idx)
-        total_lines_on_page = min(page_size, total_lines - page_idx * page_size)
-        if old_idx is not None and 0 <= old_idx < len(page_links):
-            old_pos = page_links[old_idx]
-            old_line = wrapped_lines[old_pos[0]]
-            writer.write(cursor_up(total_lines_on_page + 1 - (old_pos[0] - page_idx * page_size)) + "\r")
-            writer.write(old_line)
-            writer.write(cursor_down(total_lines_on_page + 1 - (old_pos[0] - page_idx * page_size)) + "\r")
-        if new_idx is not None and 0 <= new_idx < len(page_links):
-            new_pos = page_links[new_idx]
-            new_line = wrapped_lines[new_pos[0]]
-            writer.write(cursor_up(total_lines_on_page + 1 - (new_pos[0] - page_idx * page_size)) + "\r")
-            line_before = new_line[:(new_pos[1])]
-            line_mid = new_line[new_pos[1]:(new_pos[2])]
-            line_after = new_line[new_pos[2]:]
-            line_mid = "<" + line_mid[1:-1] + ">"
-            writer.write(line_before + line_mid + line_after)
-            writer.write(cursor_down(total_lines_on_page + 1 - (new_pos[0] - page_idx * page_size)) + "\r")
+        # The screen model sends just the lines whose highlight changed
+        render_page(page_idx, new_idx)
         await writer.drain()
 
     selected_link = None
 
+    render_task = asyncio.ensure_future(article.render_in_background())
+    page_stats = None
     while keep_going:
         if need_reprint:
-            writer.write("\033[2J\033[H")
-            start = page_index * page_size
-            end = min(start + page_size, total_lines)
-            page_lines = wrapped_lines[start:end]
-            page_lines = highlight_lines_with_links(page_lines, page_index, selected_link)
-
-            for line in page_lines:
-                writer.write(line + "\r\n")
-
-            # If AI is not activated, omit 'a=AI' from the prompt
-            if conf["AI_ACTIVATED"]:
-                writer.write(
-                    f"\r\n-- Page {page_index+1}/{total_pages} -- "
-                    f"(l=next, h=prev, t=TOC, q=exit, j/k=links, s/d=search, a=AI): "
-                )
-            else:
-                writer.write(
-                    f"\r\n-- Page {page_index+1}/{total_pages} -- "
-                    f"(l=next, h=prev, t=TOC, q=exit, j/k=links, s/d=search): "
-                )
+            page_stats = (writer.bytes_out + writer._pending, writer.segments_out)
+            render_page(page_index, selected_link)
             await writer.drain()
             need_reprint = False
 
         key = await reader.read(1)
+        if page_stats:
+            telnet_debug_print(conf, f"Page {page_index+1}: {writer.bytes_out - page_stats[0]} bytes "
+                                     f"in {writer.segments_out - page_stats[1]} segments")
+            page_stats = None
         if not key:
+            render_task.cancel()
             return
 
         if key == "\x1b":
@@ -807,18 +1886,32 @@ async def paginate_article(
             else:
                 key = "??"
 
+        # A key pressed while a paced page is still going out skips the rest
+        # of it. j/k only patch the page in place, so they queue behind it.
+        if key not in ("j", "k") and writer.pending_output():
+            writer.discard_pending()
+            need_reprint = True
+
         page_links = get_page_links(page_index)
 
         if key in ("\r", "\n"):
-            if selected_link is not None and page:
+            if selected_link is not None:
                 # Open the link
                 link_title = page_links[selected_link][3]
                 writer.write("\033[2J\033[HLoading\r")
                 await writer.drain()
                 loading_task = asyncio.create_task(loading_dots(writer))
-    
+
                 try:
-                    new_page = await asyncio.to_thread(wikipedia.page, title=link_title, auto_suggest=False)
+                    new_page = await await_cancellable_by_key(reader, wiki_article(conf, link_title))
+                except WikiFetchCancelled:
+                    loading_task.cancel()
+                    try:
+                        await loading_task
+                    except asyncio.CancelledError:
+                        pass
+                    need_reprint = True
+                    continue
                 except:
                     loading_task.cancel()
                     try:
@@ -830,12 +1923,7 @@ async def paginate_article(
                     need_reprint = True
                     continue
 
-                new_content = remove_wiki_markup(new_page.content)
-                new_content = re.sub(r'\n\s+', '\n', new_content)
-                sub_links = [l for l in new_page.links if len(l) > 1]
-                new_wrapped = wrap_content(new_content, line_width, sub_links)
-
-                new_toc, new_raw = extract_toc_and_lines(new_content)
+                new_article = RenderedArticle(new_page, line_width)
 
                 loading_task.cancel()
                 try:
@@ -847,15 +1935,13 @@ async def paginate_article(
 
                 await paginate_article(
                     conf,
-                    new_wrapped, writer, reader,
-                    page_size, line_width,
-                    new_raw, new_toc,
-                    page_title=link_title
+                    new_article, writer, reader,
+                    page_size, line_width, user_id
                 )
 
                 need_reprint = True
 
-            elif page_index < total_pages - 1:
+            elif not is_last_page(page_index):
                 page_index += 1
                 selected_link = None
                 need_reprint = True
@@ -863,7 +1949,7 @@ async def paginate_article(
                 keep_going = False
 
         elif key == "l":
-            if page_index < total_pages - 1:
+            if not is_last_page(page_index):
                 page_index += 1
                 selected_link = None
                 need_reprint = True
@@ -907,13 +1993,9 @@ async def paginate_article(
                 if sel == TOC_GO_TO_ARTICLE_START:
                     page_index = 0
                 elif sel is not None and isinstance(sel, int):
-                    chapter_raw = toc[sel][1]
-                    preceding_text = "\n".join(raw_lines[:chapter_raw])
-                    preceding_text = remove_wiki_markup(preceding_text)
-                    preceding_wrapped = wrap_content(preceding_text, line_width, links)
-                    new_page_idx = len(preceding_wrapped) // page_size
-                    if new_page_idx >= total_pages:
-                        new_page_idx = total_pages - 1
+                    new_page_idx = article.chapter_line(sel) // page_size
+                    if new_page_idx >= total_pages():
+                        new_page_idx = total_pages() - 1
                     page_index = new_page_idx
                 selected_link = None
                 need_reprint = True
@@ -925,14 +2007,16 @@ async def paginate_article(
             search_state.term = None
             search_state.matches = []
             search_state.match_index = 0
+            article.finish()
             await do_article_search(writer, reader, search_state, wrapped_lines)
             need_reprint = True
 
         elif key.lower() == "d":
             if not search_state.term:
+                article.finish()
                 await do_article_search(writer, reader, search_state, wrapped_lines)
             else:
-                new_pg = await jump_to_next_match(search_state, total_pages, page_size, page_index)
+                new_pg = await jump_to_next_match(search_state, total_pages(), page_size, page_index)
                 if new_pg is not None:
                     page_index = new_pg
             selected_link = None
@@ -941,15 +2025,18 @@ async def paginate_article(
         elif key.lower() == "a":
             # Only proceed if AI is activated
             if conf["AI_ACTIVATED"]:
+                article.finish()
                 article_text = "\n".join(wrapped_lines)
                 await show_ai_conversation_overlay(
                     conf,
                     writer, reader,
                     article_text, page_index,
                     user_id, line_width, page_size,
-                    is_top_level=False
+                    is_top_level=False,
+                    article_title=article.title
                 )
                 need_reprint = True
+    render_task.cancel()
 
 async def configure_terminal(writer, reader, conf):
     global CONF
@@ -996,16 +2083,45 @@ async def configure_terminal(writer, reader, conf):
     writer.write(f"Page size set to: {ps+1}\r\n\r\n")
     await writer.drain()
 
+    writer.write("Enter baud rate, or 'auto' (default unlimited): ")
+    await writer.drain()
+    baud_input = (await read_line_custom(writer, reader)).strip().lower()
+    writer.write("\r\n")
+    if baud_input == "auto":
+        baud = "auto"
+    else:
+        try:
+            baud = int(baud_input) if baud_input else None
+        except:
+            baud = None
+        if baud is not None and baud < 50:
+            baud = None
+    writer.set_pacing(baud)
+    # The page size prompt asks for the terminal height, the line width
+    # prompt for its width
+    writer.screen.height = ps + 1
+    writer.screen.width = lw
+    writer.write(f"Baud rate set to: {baud or 'unlimited'}\r\n\r\n")
+    await writer.drain()
+
     real_lw = lw - 2 if lw > 2 else 1
 #    writer.write(f"Article wrapping set to {real_lw} (2 less than line width)\r\n\r\n")
     await writer.drain()
     return enc, real_lw, ps
 
-async def top_level_wiki_search(conf, writer, reader, query, line_width, page_size):
-    writer.write(f"Searching for '{query}'...\r\n")
+async def top_level_wiki_search(conf, writer, reader, query, line_width, page_size, user_id):
+    writer.write(f"Searching for '{query}'... (q=cancel)\r\n")
     await writer.drain()
-    wikipedia.set_lang(conf["LANG"])
-    results = wikipedia.search(query)
+    try:
+        results = await await_cancellable_by_key(reader, wiki_search(conf, query))
+    except WikiFetchCancelled:
+        writer.write("\r\nCancelled.\r\n\r\n")
+        await writer.drain()
+        return
+    except Exception as e:
+        writer.write(f"Error searching Wikipedia: {e}\r\n\r\n")
+        await writer.drain()
+        return
     if not results:
         writer.write("No results found.\r\n\r\n")
         await writer.drain()
@@ -1016,7 +2132,7 @@ async def top_level_wiki_search(conf, writer, reader, query, line_width, page_si
     await writer.drain()
     try:
         try:
-            page = wikipedia.page(title=page_title, auto_suggest=False, preload=False)
+            page = await await_cancellable_by_key(reader, wiki_article(conf, page_title))
         except wikipedia.DisambiguationError as e:
             opts = [opt.strip() for opt in e.options]
             sel = await select_option(
@@ -1030,14 +2146,10 @@ async def top_level_wiki_search(conf, writer, reader, query, line_width, page_si
             page_title = opts[sel]
             writer.write(f"\r\nRetrieving page: {page_title}\r\n")
             await writer.drain()
-            page = wikipedia.page(title=page_title, auto_suggest=False, preload=False)
-
-        content = remove_wiki_markup(page.content)
-        content = re.sub(r'\n\s+', '\n', content)
-        safe_links = [l for l in page.links if len(l) > 1]
+            page = await await_cancellable_by_key(reader, wiki_article(conf, page_title))
 
-        toc, raw_lines = extract_toc_and_lines(content)
-        wrapped = wrap_content(content, line_width, safe_links)
+        article = RenderedArticle(page, line_width)
+        toc = article.toc
 
         init_page = 0
         if toc:
@@ -1049,28 +2161,29 @@ async def top_level_wiki_search(conf, writer, reader, query, line_width, page_si
             if sel == TOC_GO_TO_ARTICLE_START:
                 init_page = 0
             elif sel is not None and isinstance(sel, int):
-                chapter_raw = toc[sel][1]
-                preceding_text = "\n".join(raw_lines[:chapter_raw])
-                preceding_text = remove_wiki_markup(preceding_text)
-                preceding_wrapped = wrap_content(preceding_text, line_width, safe_links)
-                init_page = len(preceding_wrapped) // page_size
+                init_page = article.chapter_line(sel) // page_size
 
         await paginate_article(
             conf,
-            wrapped, writer, reader,
-            page_size, line_width,
-            raw_lines, toc,
-            initial_page=init_page,
-            page_title=page_title
+            article, writer, reader,
+            page_size, line_width, user_id,
+            initial_page=init_page
         )
         writer.write("\r\n--- End of Article ---\r\n")
         await writer.drain()
+    except WikiFetchCancelled:
+        writer.write("\r\nCancelled.\r\n\r\n")
+        await writer.drain()
     except Exception as e:
         writer.write(f"Error retrieving article: {e}\r\n\r\n")
         await writer.drain()
 
 async def shell(reader, writer):
     global CONF
+    writer = SessionWriter(writer)
+    reader = SessionReader(reader, writer)
+    term = writer.get_extra_info("TERM") or ""
+    writer.screen.full_redraw_only = term.lower().startswith("dumb")
     if hasattr(writer, 'set_echo'):
         writer.set_echo(False)
 
@@ -1104,6 +2217,8 @@ async def shell(reader, writer):
 
     # Default shell mode
     shell_mode = "wiki"
+    # One id per session, so the AI server keeps a single history for it
+    user_id = uuid.uuid4().hex
 
     while True:
         prompt = "Wiki> " if shell_mode == "wiki" else "AI> "
@@ -1161,11 +2276,10 @@ async def shell(reader, writer):
             continue
 
         if shell_mode == "wiki":
-            await top_level_wiki_search(CONF, writer, reader, cmd, article_width, page_size)
+            await top_level_wiki_search(CONF, writer, reader, cmd, article_width, page_size, user_id)
         else:
             # Only proceed if AI is actually activated
             if CONF["AI_ACTIVATED"]:
-                user_id = "top-level-ai-user"
                 await show_ai_conversation_overlay(
                     CONF,
                     writer, reader,
@@ -1181,6 +2295,7 @@ async def shell(reader, writer):
                 writer.write("[AI not available]\r\n")
                 await writer.drain()
 
+    telnet_debug_print(CONF, f"Session output: {writer.bytes_out} bytes in {writer.segments_out} segments")
     writer.close()
 
 def telnet_fix_newlines(text):
@@ -1194,8 +2309,27 @@ def main():
 
     port = CONF["PORT"]
 
+    global WIKI_EXECUTOR, ARTICLE_CACHE, DISK_STORE, DISK_EXECUTOR, UPLINK, AI_POOL
+    WIKI_EXECUTOR = ThreadPoolExecutor(max_workers=CONF["WIKI_WORKERS"], thread_name_prefix="wiki")
+    # Once, before any lookup: set_lang() clears the library's shared caches
+    wikipedia.set_lang(CONF["LANG"])
+    wikipedia.wikipedia.requests = WikiHTTP(CONF["WIKI_TIMEOUT"])
+    ARTICLE_CACHE = ArticleCache(
+        CONF["CACHE_MAX_ENTRIES"], CONF["CACHE_MAX_BYTES"],
+        CONF["CACHE_TTL"], CONF["CACHE_NEGATIVE_TTL"]
+    )
+    if CONF["DISK_CACHE"]:
+        DISK_STORE = DiskArticleStore(
+            CONF["DISK_CACHE_PATH"], CONF["DISK_CACHE_MAX_BYTES"], CONF["DISK_CACHE_TTL"]
+        )
+        DISK_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk")
+
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
+    UPLINK = UplinkScheduler(CONF["UPLINK_BYTES_PER_SEC"])
+    if CONF["AI_ACTIVATED"]:
+        AI_POOL = AIConnectionPool(CONF, CONF["AI_CONNECTIONS"])
+        AI_POOL.start()
     server = telnetlib3.create_server(port=port, shell=shell, encoding='utf8')
     loop.run_until_complete(server)
     print(f"Telnet server running on port {port}")
@@ -0,0 +1,120 @@
+"""The AI answer loop against a fake AI connection pool and telnet client."""
+import asyncio
+import json
+
+import websockets
+
+import server
+
+
+class Writer:
+    def __init__(self):
+        self.data = ""
+
+    def write(self, text):
+        self.data += text
+
+    async def drain(self):
+        pass
+
+    def link_bytes_per_sec(self):
+        return None
+
+
+class DisconnectedReader:
+    """A telnet reader after the client went away: read() returns "" without waiting."""
+    def __init__(self):
+        self.reads = 0
+
+    async def read(self, n=-1):
+        self.reads += 1
+        if self.reads > 1000:
+            raise RuntimeError("still reading after EOF")
+        return ""
+
+
+class Stream:
+    """An answer that never arrives."""
+    def __init__(self):
+        self.cancelled = False
+
+    async def next_frame(self, timeout):
+        await asyncio.sleep(timeout)
+        raise asyncio.TimeoutError
+
+    async def cancel(self):
+        self.cancelled = True
+
+
+class Pool:
+    def __init__(self):
+        self.stream = Stream()
+
+    async def request(self, payload):
+        return self.stream
+
+
+def test_disconnect_mid_answer_cancels_the_request(monkeypatch):
+    pool = Pool()
+    monkeypatch.setattr(server, "AI_POOL", pool)
+    reader = DisconnectedReader()
+
+    async def scenario():
+        return await asyncio.wait_for(server.stream_ai_with_spinner_and_interrupts(
+            {"DEBUG": False}, "question?", "", 0, "user", [], Writer(), reader
+        ), timeout=5)
+
+    text, canceled = asyncio.run(scenario())
+    assert canceled and text == ""
+    assert pool.stream.cancelled
+    assert reader.reads == 1
+
+
+async def answer_server(connections):
+    """A websocket AI server answering every request with one token; `connections` collects the sockets."""
+    async def handler(ws, *path):
+        connections.append(ws)
+        async for message in ws:
+            request = json.loads(message)
+            if request.get("type") != "request":
+                continue
+            for frame in ({"type": "token", "text": request["new_question"]}, {"type": "end"}):
+                await ws.send(json.dumps(dict(frame, request_id=request["request_id"])))
+    return await websockets.serve(handler, "127.0.0.1", 0)
+
+
+async def ask(conn, question):
+    stream = await conn.request({"new_question": question})
+    frames = []
+    while not stream.ended:
+        frames.append(await stream.next_frame(5))
+    return frames[0]["text"]
+
+
+def test_connection_is_reused_and_reestablished():
+    async def scenario():
+        connections = []
+        ws_server = await answer_server(connections)
+        port = ws_server.sockets[0].getsockname()[1]
+        conn = server.AIConnection({"AI_URI": f"ws://127.0.0.1:{port}", "DEBUG": False})
+        try:
+            assert await ask(conn, "one") == "one"
+            assert await ask(conn, "two") == "two"
+            assert len(connections) == 1
+
+            await connections[0].close()
+            for _ in range(100):
+                if not conn.connected() and conn.active_requests() == 0:
+                    break
+                await asyncio.sleep(0.01)
+            assert await ask(conn, "three") == "three"
+            assert len(connections) == 2
+        finally:
+            for ws in connections:
+                await ws.close()
+            ws_server.close()
+            await ws_server.wait_closed()
+            if conn._keeper is not None:
+                conn._keeper.cancel()
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=10))
@@ -0,0 +1,72 @@
+"""
+The disk store must serve stale copies while Wikipedia hangs, even when every
+WIKI_EXECUTOR thread is stuck on an upstream fetch.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def wiki(monkeypatch, tmp_path):
+    conf = server.load_config("/nonexistent")
+    conf["WIKI_TIMEOUT"] = 1.0
+    release = threading.Event()
+
+    def hung_page(title):
+        release.wait(10)
+        return server.WikiArticle(title, "fresh text", [])
+
+    store = server.DiskArticleStore(str(tmp_path / "articles.sqlite3"), 1 << 20, ttl=0)
+    store.save(conf["LANG"], "Stored", server.WikiArticle("Stored", "stale text", ["Link"]))
+    wiki_executor = ThreadPoolExecutor(max_workers=2)
+    disk_executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(server, "WIKI_EXECUTOR", wiki_executor)
+    monkeypatch.setattr(server, "DISK_EXECUTOR", disk_executor)
+    monkeypatch.setattr(server, "DISK_STORE", store)
+    monkeypatch.setattr(server, "ARTICLE_CACHE", server.ArticleCache(10, 1 << 20, 60, 60))
+    monkeypatch.setattr(server, "_wiki_page_blocking", hung_page)
+    yield conf
+    release.set()
+    wiki_executor.shutdown()
+    disk_executor.shutdown()
+
+
+def test_stale_copy_served_while_all_wiki_workers_hang(wiki):
+    async def scenario():
+        # Two hung fetches take both WIKI_EXECUTOR threads
+        hung = [asyncio.ensure_future(server.wiki_article(wiki, title)) for title in ("B", "C")]
+        await asyncio.sleep(0.1)
+        start = time.perf_counter()
+        article = await server.wiki_article(wiki, "Stored")
+        elapsed = time.perf_counter() - start
+        for task in hung:
+            task.cancel()
+        await asyncio.gather(*hung, return_exceptions=True)
+        return article, elapsed
+
+    article, elapsed = asyncio.run(scenario())
+    assert article.content == "stale text"
+    # served once the upstream fetch times out, not failed with it
+    assert elapsed < wiki["WIKI_TIMEOUT"] + 0.5
+
+
+def test_failed_disk_write_is_reported(wiki, monkeypatch, capsys):
+    def broken_save(lang, title, article):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(server.DISK_STORE, "save", broken_save)
+    monkeypatch.setattr(server, "_wiki_page_blocking", lambda title: server.WikiArticle(title, "text", []))
+
+    async def scenario():
+        await server.wiki_article(wiki, "New")
+        while server.DISK_SAVES:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert "disk full" in capsys.readouterr().out
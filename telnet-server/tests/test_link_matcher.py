@@ -0,0 +1,26 @@
+import server
+
+
+def test_leftmost_longest_case_insensitive():
+    matcher = server.LinkMatcher(["Morse", "Morse code", "Mo", "Morsel", "x"])
+    text = "I like morse Code and MORSE, mo, morsels, x."
+    assert [(text[s:e], link) for s, e, link in matcher.finditer(text)] == [
+        ("morse Code", "Morse code"), ("MORSE", "Morse"), ("mo", "Mo"), ("morsel", "Morsel"),
+    ]
+
+
+def test_single_link_branches_are_leaves():
+    matcher = server.LinkMatcher(["Telegraph", "Telephone"])
+    # shared "tele" prefix, then one leaf per link
+    node = matcher.root["t"]["e"]["l"]["e"]
+    assert node["g"] == ("raph", "Telegraph")
+    assert node["p"] == ("hone", "Telephone")
+    assert list(matcher.finditer("telegrap")) == []
+
+
+def test_matcher_built_once_per_article_and_counted_in_its_size():
+    article = server.WikiArticle("T", "Paris is in France.", ["Paris", "France"])
+    assert article.size() > len(article.content) + len("ParisFrance")
+    lines, positions, _ = server.wrap_content_indexed(article.content, 78, article.link_matcher)
+    assert lines == ["[Paris] is in [France]."]
+    assert [link for _, _, _, link in positions] == ["Paris", "France"]
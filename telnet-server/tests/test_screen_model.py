@@ -0,0 +1,142 @@
+"""
+ScreenModel deltas must leave the terminal showing exactly what a full
+redraw would, checked on a small VT100-style emulator with autowrap.
+"""
+import re
+
+import pytest
+
+import server
+
+CSI_RE = re.compile(r"\x1b\[([0-9;?]*)([@-~])")
+
+
+class Terminal:
+    def __init__(self, width, height):
+        self.width, self.height = width, height
+        self.grid = [[" "] * width for _ in range(height)]
+        self.x = self.y = 0
+        self.pending_wrap = False
+
+    def _linefeed(self):
+        if self.y == self.height - 1:
+            self.grid = self.grid[1:] + [[" "] * self.width]
+        else:
+            self.y += 1
+
+    def feed(self, data):
+        i = 0
+        while i < len(data):
+            m = CSI_RE.match(data, i)
+            if m:
+                n = int(m.group(1)) if m.group(1).isdigit() else 1
+                op = m.group(2)
+                if op == "A":
+                    self.y = max(0, self.y - n)
+                elif op == "B":
+                    self.y = min(self.height - 1, self.y + n)
+                elif op == "C":
+                    self.x = min(self.width - 1, self.x + n)
+                elif op == "K":
+                    self.grid[self.y][self.x:] = [" "] * (self.width - self.x)
+                elif op == "J":
+                    self.grid = [[" "] * self.width for _ in range(self.height)]
+                elif op == "H":
+                    self.x = self.y = 0
+                self.pending_wrap = False
+                i = m.end()
+                continue
+            ch = data[i]
+            i += 1
+            if ch == "\r":
+                self.x, self.pending_wrap = 0, False
+            elif ch == "\n":
+                self._linefeed()
+                self.pending_wrap = False
+            else:
+                if self.pending_wrap:
+                    self.x, self.pending_wrap = 0, False
+                    self._linefeed()
+                self.grid[self.y][self.x] = ch
+                if self.x == self.width - 1:
+                    self.pending_wrap = True
+                else:
+                    self.x += 1
+
+    def screen(self):
+        return ["".join(row).rstrip() for row in self.grid], (self.y, self.x)
+
+
+class Output:
+    def __init__(self):
+        self.data = ""
+
+    def write(self, text):
+        self.data += text
+
+
+def pager_frames(width, footer):
+    """Pages of a wrapped article with one link highlighted in turn, as paginate_article draws them."""
+    body = [("word " * width)[:width - 2].rstrip() for _ in range(20)]
+    frames = []
+    for selected in range(4):
+        rows = list(body)
+        rows[selected * 3] = "\033[7m[Link]\033[0m" + rows[selected * 3][6:]
+        frames.append(rows + ["", footer])
+    return frames
+
+
+PAGER_FOOTER = "-- Page {}/{} -- (l=next, h=prev, t=TOC, q=exit, j/k=links, s/d=search, a=AI): "
+
+
+FOOTERS = [
+    (80, PAGER_FOOTER.format(1, 3)),
+    # 80 characters: ends in the last column
+    (80, PAGER_FOOTER.format(10, "~12")),
+    # 81 characters: wraps onto a second line
+    (80, PAGER_FOOTER.format(12, "~142")),
+    (40, PAGER_FOOTER.format(1, 3)),
+    (40, PAGER_FOOTER.format(10, "~12")),
+]
+
+
+@pytest.mark.parametrize("width, footer", FOOTERS)
+def test_delta_matches_full_redraw(width, footer):
+    height = 23
+    model = server.ScreenModel()
+    model.height, model.width = height, width
+    term = Terminal(width, height)
+    out = Output()
+    for frame in pager_frames(width, footer):
+        model.render(out, frame)
+    term.feed(out.data)
+
+    reference = Terminal(width, height)
+    reference.feed("\033[2J\033[H" + "\r\n".join(frame))
+    assert term.screen() == reference.screen()
+
+
+@pytest.mark.parametrize("width, footer", FOOTERS)
+def test_link_move_is_sent_as_delta(width, footer):
+    """A j/k press only rewrites the two link rows, wrapped footer or not."""
+    model = server.ScreenModel()
+    model.height, model.width = 23, width
+    frames = pager_frames(width, footer)
+    out = Output()
+    model.render(out, frames[0])
+    full = len(out.data)
+    out.data = ""
+    model.render(out, frames[1])
+    assert 0 < len(out.data) < 2 * width + 40 < full // 4
+
+
+def test_footer_wrapping_onto_another_line_redraws_in_full():
+    model = server.ScreenModel()
+    model.height, model.width = 23, 80
+    first, second = pager_frames(80, PAGER_FOOTER.format(9, 12))[:2]
+    second[-1] = PAGER_FOOTER.format(100, 120)
+    out = Output()
+    model.render(out, first)
+    out.data = ""
+    model.render(out, second)
+    assert out.data.startswith("\033[2J")
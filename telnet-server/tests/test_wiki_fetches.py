@@ -0,0 +1,104 @@
+"""
+Upstream MediaWiki fetches (WIKI_FETCH_COUNTS) while browsing, with the
+blocking wikipedia calls stubbed out.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import server
+
+PAGES = {
+    "Alpha": ("Alpha is a letter that comes before Beta in the alphabet.", ["Beta"]),
+    "Beta": ("Beta is the letter after Alpha.", ["Alpha"]),
+}
+
+
+class Writer:
+    def __init__(self):
+        self.data = ""
+
+    def write(self, text):
+        self.data += text
+
+    async def drain(self):
+        pass
+
+    def get_extra_info(self, name, default=None):
+        return default
+
+
+class ScriptedReader:
+    """Types `keys` one by one, noting the page fetch count when each is read."""
+    DELAY = 0.1
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self.counts = []
+
+    async def read(self, n=-1):
+        # a read cancelled while an article loads doesn't consume a key
+        await asyncio.sleep(self.DELAY)
+        if not self.keys:
+            return ""
+        self.counts.append(server.WIKI_FETCH_COUNTS["page"])
+        return self.keys.pop(0)
+
+
+@pytest.fixture
+def wiki(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def page(title):
+        with lock:
+            calls.append(title)
+        time.sleep(0.05)
+        content, links = PAGES[title]
+        return server.WikiArticle(title, content, links)
+
+    executor = ThreadPoolExecutor(max_workers=4)
+    monkeypatch.setattr(server, "WIKI_EXECUTOR", executor)
+    monkeypatch.setattr(server, "ARTICLE_CACHE", server.ArticleCache(10, 1 << 20, 60, 60))
+    monkeypatch.setattr(server, "DISK_STORE", None)
+    monkeypatch.setattr(server, "_wiki_page_blocking", page)
+    monkeypatch.setattr(server, "_wiki_search_blocking", lambda query: ["Alpha"])
+    monkeypatch.setattr(server, "WIKI_FETCH_COUNTS", {"search": 0, "page": 0})
+    conf = server.load_config("/nonexistent")
+    conf["AI_ACTIVATED"] = False
+    yield conf, calls
+    executor.shutdown()
+
+
+def test_opening_an_article_and_following_a_link_fetch_once_each(wiki):
+    conf, calls = wiki
+    # j, Enter: follow Beta; j, Enter: back to Alpha (cached); q out of all three
+    reader = ScriptedReader(["j", "\r", "j", "\r", "q", "q", "q"])
+    writer = server.SessionWriter(Writer())
+
+    async def scenario():
+        await server.top_level_wiki_search(conf, writer, server.SessionReader(reader, writer),
+                                           "alpha", 60, 20, "user")
+        await writer.flush()
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=10))
+    assert server.WIKI_FETCH_COUNTS == {"search": 1, "page": 2}
+    # Alpha open: 1 fetch; Beta followed: 1 more; Alpha again: from the cache
+    assert reader.counts == [1, 1, 2, 2, 2, 2, 2]
+    assert calls == ["Alpha", "Beta"]
+    assert "End of Article" in writer._writer.data
+
+
+def test_concurrent_opens_of_one_article_share_a_fetch(wiki):
+    conf, calls = wiki
+
+    async def scenario():
+        return await asyncio.gather(*(server.wiki_article(conf, "Alpha") for _ in range(8)))
+
+    articles = asyncio.run(scenario())
+    assert server.WIKI_FETCH_COUNTS["page"] == 1
+    assert calls == ["Alpha"]
+    assert all(article is articles[0] for article in articles)
@@ -0,0 +1,125 @@
+"""
+Load test for the non-blocking Wikipedia client: keystroke echo latency of a
+telnet session must not depend on how many slow MediaWiki lookups other
+sessions have in flight, and a stalled MediaWiki request must give its
+worker thread back once the socket timeout hits.
+"""
+import asyncio
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+import telnetlib3
+import wikipedia
+
+import server
+
+SLOW_LOOKUP = 3.0
+KEYSTROKES = 20
+
+
+def slow_search(query):
+    # A MediaWiki call that takes a while, blocking its worker thread
+    time.sleep(SLOW_LOOKUP)
+    return []
+
+
+async def login(reader, writer):
+    """Answer the captcha and accept the terminal defaults, up to the first prompt."""
+    await reader.readuntil(b"Answer: ")
+    writer.write(b"venera venera venera\r")
+    for _ in range(4):
+        await reader.readuntil(b": ")
+        writer.write(b"\r")
+    await reader.readuntil(b"Wiki> ")
+
+
+async def start_lookup(port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    await login(reader, writer)
+    writer.write(b"slow article\r")
+    await reader.readuntil(b"(q=cancel)")
+    return reader, writer
+
+
+async def echo_latencies(reader, writer):
+    latencies = []
+    for ch in b"abcdefghijklmnopqrst"[:KEYSTROKES]:
+        start = time.perf_counter()
+        writer.write(bytes([ch]))
+        await reader.readuntil(bytes([ch]))
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)
+
+
+def run_load(sessions_fetching):
+    async def scenario():
+        server_obj = await telnetlib3.create_server(
+            host="127.0.0.1", port=0, shell=server.shell, encoding="utf8", connect_maxwait=0.1
+        )
+        port = server_obj.sockets[0].getsockname()[1]
+        try:
+            lookups = await asyncio.gather(*(start_lookup(port) for _ in range(sessions_fetching)))
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            await login(reader, writer)
+            latencies = await echo_latencies(reader, writer)
+            writer.close()
+            for _, lookup_writer in lookups:
+                lookup_writer.close()
+            return latencies
+        finally:
+            server_obj.close()
+
+    return asyncio.run(scenario())
+
+
+@pytest.fixture
+def telnet_server(monkeypatch):
+    conf = server.load_config("/nonexistent")
+    conf["AI_ACTIVATED"] = False
+    conf["WIKI_TIMEOUT"] = SLOW_LOOKUP * 2
+    monkeypatch.setattr(server, "CONF", conf)
+    monkeypatch.setattr(server, "WIKI_EXECUTOR", ThreadPoolExecutor(max_workers=conf["WIKI_WORKERS"]))
+    monkeypatch.setattr(server, "ARTICLE_CACHE", server.ArticleCache(10, 1 << 20, 60, 60))
+    monkeypatch.setattr(server, "UPLINK", server.UplinkScheduler(0))
+    monkeypatch.setattr(server, "_wiki_search_blocking", slow_search)
+    yield conf
+    server.WIKI_EXECUTOR.shutdown(wait=False)
+
+
+@pytest.mark.parametrize("sessions_fetching", [0, 4, 16])
+def test_keystroke_latency_independent_of_fetches_in_flight(telnet_server, sessions_fetching):
+    latencies = run_load(sessions_fetching)
+    median = latencies[len(latencies) // 2]
+    worst = latencies[-1]
+    print(f"{sessions_fetching} lookups in flight: median {median * 1000:.1f} ms, worst {worst * 1000:.1f} ms")
+    # A blocked event loop would show up as SLOW_LOOKUP-sized stalls
+    assert median < 0.05
+    assert worst < 0.5
+
+
+def test_stalled_mediawiki_request_frees_its_thread(monkeypatch):
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    accepted = []
+    # Accepts connections and never answers
+    threading.Thread(target=lambda: accepted.append(listener.accept()), daemon=True).start()
+    port = listener.getsockname()[1]
+
+    monkeypatch.setattr(wikipedia.wikipedia, "requests", server.WikiHTTP(0.5))
+    monkeypatch.setattr(wikipedia.wikipedia, "API_URL", f"http://127.0.0.1:{port}/w/api.php")
+    monkeypatch.setattr(wikipedia.wikipedia, "RATE_LIMIT", False)
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    start = time.perf_counter()
+    with pytest.raises(requests.exceptions.Timeout):
+        executor.submit(server._wiki_search_blocking, "anything").result(timeout=5)
+    assert time.perf_counter() - start < 2
+    # the single worker is free again
+    assert executor.submit(lambda: "free").result(timeout=1) == "free"
+    executor.shutdown()
+    listener.close()